@@ -40,6 +40,7 @@ class PostAdmin(admin.ModelAdmin):
     list_display = (
         'title',
         'is_published',
+        'is_visible',
         'category',
         'author',
         'location',
@@ -1,2 +1,46 @@
 MAX_LENGTH = 256
 MAX_POSTS = 10
+MAX_OFFSET_PAGES = 5
+TIMELINE_SIZE = 500
+FANOUT_MAX_FOLLOWERS = 10000
+HOT_POSTS_SIZE = 1000
+HOT_HALF_LIFE = 24 * 60 * 60
+HOT_REBASE_EXPONENT = 32
+HOT_LIKE_WEIGHT = 1
+HOT_COMMENT_WEIGHT = 2
+HOT_VIEW_WEIGHT = 0.1
+TRENDING_HOURS = 24
+TOP_K = 100
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+UNIQUE_VIEWERS_TTL = 30 * 24 * 60 * 60
+VIEWS_FLUSH_BATCH_SIZE = 500
+VIEWS_FLUSH_LOCK_TTL = 10 * 60
+VIEWS_FLUSH_LOG_TTL = 24 * 60 * 60
+COMMENTS_PER_PAGE = 20
+COMMENT_PATH_LENGTH = 1024
+COMMENT_PATH_SEGMENT = 8
+COMMENT_INLINE_DEPTH = 3
+COMMENT_INLINE_REPLIES = 3
+COMMENT_REPLIES_PER_PAGE = 20
+COMMENT_MAX_DEPTH = 100
+LIKE_SHARDS = 16
+LIKE_SHARD_CACHE_TTL = 5
+LIKES_FLUSH_BATCH_SIZE = 500
+LIKES_FLUSH_LOCK_TTL = 10 * 60
+LIKES_FLUSH_LOG_TTL = 24 * 60 * 60
+LIKES_BATCH_SIZE = 100
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+THUMBNAIL_QUALITY = 80
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+THUMBNAIL_BATCH_SIZE = 100
+MEDIA_GC_BATCH_SIZE = 500
+MEDIA_GC_GRACE = 60 * 60
+S3_PART_SIZE = 8 * 1024 * 1024
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_READ_SIZE = 64 * 1024
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+UPLOAD_EXPIRY = 24 * 60 * 60
+UPLOAD_ATTACH_DELAY = 10 * 60
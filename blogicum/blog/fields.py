@@ -0,0 +1,47 @@
+import hashlib
+import posixpath
+
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+
+
+def content_name(directory, name, content):
+    """Имя файла по SHA-256 содержимого: <каталог>/<ab>/<хэш>.<расширение>.
+
+    Первые два символа хэша — подкаталог, чтобы в одном каталоге
+    не копились сотни тысяч файлов.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    digest = digest.hexdigest()
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], f'{digest}{extension}')
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        """Сохраняет файл под хэшем содержимого.
+
+        Если такой файл уже есть в хранилище, он не записывается
+        повторно: публикация просто ссылается на существующий.
+        """
+        name = content_name(self.field.upload_to, name, content)
+        if not self.storage.exists(name):
+            name = self.storage.save(
+                name, content, max_length=self.field.max_length
+            )
+        self.name = name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+    save.alters_data = True
+
+
+class ContentAddressedImageField(models.ImageField):
+    """ImageField, который хранит одинаковые фото одним файлом."""
+
+    attr_class = ContentAddressedFieldFile
@@ -0,0 +1,123 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Contact, FollowStats, User
+
+
+def count_contacts(field):
+    return Coalesce(
+        Subquery(
+            Contact.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def create_follow_stats(*user_ids):
+    """Заводит недостающие счётчики, посчитав их по Contact.
+
+    Вызывается до вставки подписки: строку FollowStats создаёт одна
+    транзакция, остальные упираются в уникальный user_id и дальше
+    меняют уже существующую строку через F().
+    """
+    existing = set(
+        FollowStats.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', flat=True)
+    )
+    FollowStats.objects.bulk_create(
+        [
+            FollowStats(
+                user_id=user_id,
+                followers_count=Contact.objects.filter(
+                    user_to_id=user_id
+                ).count(),
+                following_count=Contact.objects.filter(
+                    user_from_id=user_id
+                ).count(),
+            )
+            for user_id in set(user_ids) - existing
+        ],
+        ignore_conflicts=True
+    )
+
+
+def get_follow_stats(user):
+    stats = FollowStats.objects.filter(user=user).first()
+    if stats is None:
+        create_follow_stats(user.id)
+        stats = FollowStats.objects.get(user=user)
+    return stats
+
+
+def change_follow_counts(user_from_id, user_to_id, delta):
+    """Сдвигает счётчики; отсутствующие строки не трогает.
+
+    Строки без счётчиков потом заведёт create_follow_stats по Contact.
+    """
+    for user_id, field in (
+        (user_from_id, 'following_count'),
+        (user_to_id, 'followers_count'),
+    ):
+        FollowStats.objects.filter(user_id=user_id).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def follow(user_from, user_to):
+    """Подписка одним INSERT; повторная подписка ничего не меняет.
+
+    Дубликаты отсекает уникальное ограничение unique_follow, поэтому
+    одновременные запросы не создают двух строк. Счётчики подписок
+    меняются в той же транзакции. Возвращает True, если подписка
+    создана.
+    """
+    try:
+        with transaction.atomic():
+            create_follow_stats(user_from.id, user_to.id)
+            Contact.objects.create(user_from=user_from, user_to=user_to)
+            change_follow_counts(user_from.id, user_to.id, 1)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user_from, user_to):
+    """Отписка одним DELETE; возвращает True, если подписка была.
+
+    Счётчики уменьшает обработчик post_delete у Contact.
+    """
+    deleted, _ = Contact.objects.filter(
+        user_from=user_from, user_to=user_to
+    ).delete()
+    return bool(deleted)
+
+
+def is_following(user, profile):
+    if not user.is_authenticated:
+        return False
+    return Contact.objects.filter(user_from=user, user_to=profile).exists()
+
+
+def rebuild_follow_counts():
+    """Заводит недостающие счётчики и пересчитывает все одним UPDATE."""
+    FollowStats.objects.bulk_create(
+        [
+            FollowStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                follow_stats__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return FollowStats.objects.update(
+        followers_count=count_contacts('user_to'),
+        following_count=count_contacts('user_from'),
+    )
@@ -20,7 +20,9 @@ class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
-        exclude = ['author', 'users_like', 'total_likes']
+        exclude = [
+            'author', 'users_like', 'total_likes', 'comment_count', 'views'
+        ]
         widgets = {
             'pub_date': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
         }
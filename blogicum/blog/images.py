@@ -0,0 +1,184 @@
+import base64
+import logging
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from PIL import Image, ImageOps
+
+from .constants import (
+    PLACEHOLDER_QUALITY, PLACEHOLDER_WIDTH, THUMBNAIL_QUALITY, THUMBNAIL_WIDTHS
+)
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_NAME = re.compile(
+    rf'^(?P<directory>.+)/{THUMBNAIL_DIR}/(?P<filename>[^/]+)\.\d+w\.webp$'
+)
+
+thumbnail_pool = ThreadPoolExecutor(
+    max_workers=settings.THUMBNAIL_WORKERS,
+    thread_name_prefix='thumbnails'
+)
+
+
+def thumbnail_widths(width):
+    """Ширины миниатюр для фото шириной width.
+
+    Фото не увеличиваются: узкое фото получает одну миниатюру
+    своей ширины вместо всех, что шире него.
+    """
+    return sorted({min(size, width) for size in THUMBNAIL_WIDTHS})
+
+
+def thumbnail_name(name, width):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(
+        directory, THUMBNAIL_DIR, f'{filename}.{width}w.webp'
+    )
+
+
+def thumbnail_original(name):
+    """Имя оригинала для миниатюры или None, если name — не миниатюра."""
+    match = THUMBNAIL_NAME.match(name)
+    if match is None:
+        return None
+    return posixpath.join(match['directory'], match['filename'])
+
+
+def make_placeholder(image):
+    """Крошечная копия фото в виде data URI для фона до загрузки.
+
+    Браузер растягивает её на размер фото, и она выглядит размытой.
+    Прозрачные места заливаются белым, как фон карточки, иначе
+    заглушка просвечивала бы через загруженное фото.
+    """
+    width, height = image.size
+    placeholder = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))),
+        Image.Resampling.BOX
+    )
+    if placeholder.mode == 'RGBA':
+        background = Image.new('RGB', placeholder.size, 'white')
+        background.paste(placeholder, mask=placeholder.getchannel('A'))
+        placeholder = background
+    buffer = BytesIO()
+    placeholder.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def make_thumbnails(name, force=False):
+    """Сохраняет WebP-миниатюры фото; возвращает размеры и заглушку.
+
+    Поворот из EXIF применяется заранее: в миниатюрах метаданных
+    нет, и без этого снимки с телефона легли бы на бок. Файлы
+    не перезаписываются, поэтому готовые миниатюры пропускаются,
+    если не задан force.
+    """
+    with default_storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    width, height = image.size
+    for size in thumbnail_widths(width):
+        thumbnail_path = thumbnail_name(name, size)
+        if default_storage.exists(thumbnail_path):
+            if not force:
+                continue
+            default_storage.delete(thumbnail_path)
+        thumbnail = image.resize(
+            (size, max(1, round(height * size / width))),
+            Image.Resampling.LANCZOS
+        )
+        buffer = BytesIO()
+        thumbnail.save(
+            buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=6
+        )
+        default_storage.save(thumbnail_path, ContentFile(buffer.getvalue()))
+    return width, height, make_placeholder(image)
+
+
+def generate_post_thumbnails(post_id, force=False):
+    """Делает миниатюры фото публикации и записывает размеры и заглушку.
+
+    Пока image_width пуст, шаблоны показывают оригинал. Размеры
+    пишутся только если фото не успели заменить за время работы.
+    """
+    name = (
+        Post.objects
+        .filter(pk=post_id)
+        .values_list('image', flat=True)
+        .first()
+    )
+    if not name:
+        return False
+    width, height, placeholder = make_thumbnails(name, force)
+    return bool(
+        Post.objects
+        .filter(pk=post_id, image=name)
+        .update(
+            image_width=width,
+            image_height=height,
+            image_placeholder=placeholder,
+            image_error=''
+        )
+    )
+
+
+def record_image_error(post_id, error):
+    Post.objects.filter(pk=post_id).update(
+        image_error=f'{type(error).__name__}: {error}'
+    )
+
+
+def thumbnail_job(post_id, force=False):
+    """generate_post_thumbnails для потока пула: закрывает его соединение.
+
+    Ошибка записывается в image_error публикации, а не только в лог.
+    """
+    try:
+        return generate_post_thumbnails(post_id, force)
+    except Exception as error:
+        record_image_error(post_id, error)
+        raise
+    finally:
+        connection.close()
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Thumbnail generation failed', exc_info=future.exception()
+        )
+
+
+def schedule_thumbnails(post_id):
+    """Отправляет генерацию миниатюр в фоновый пул потоков.
+
+    Очередь пула живёт в памяти процесса. Если процесс остановится
+    раньше, image_width останется пустым, и фото обработает команда
+    generate_thumbnails, запускаемая по cron.
+    """
+    future = thumbnail_pool.submit(thumbnail_job, post_id)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def image_srcset(post):
+    if not post.image or not post.image_width:
+        return ''
+    return ', '.join(
+        f'{default_storage.url(thumbnail_name(post.image.name, size))} '
+        f'{size}w'
+        for size in thumbnail_widths(post.image_width)
+    )
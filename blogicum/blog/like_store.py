@@ -0,0 +1,403 @@
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from redis.exceptions import RedisError
+
+from .constants import (
+    HOT_LIKE_WEIGHT, LIKES_FLUSH_BATCH_SIZE, LIKES_FLUSH_LOCK_TTL,
+    LIKES_FLUSH_LOG_TTL
+)
+from .likes import (
+    SHARDED_MODELS, add_like_delta, add_pending_likes, like_kind, set_like
+)
+from .models import LikeFlush, OfflineLike, Post
+from .ranking import bump_hot_score
+from .redis_client import REDIS, redis_lock
+from .utils import get_liked_comment_ids, get_liked_post_ids
+
+
+PENDING_LIKES_KEY = 'likes:pending'
+FLUSHING_LIKES_KEY = 'likes:flushing'
+FLUSH_ID_KEY = 'likes:flushing:id'
+FLUSH_LOCK_KEY = 'likes:flush:lock'
+# Маркер в каждом множестве: загруженное пустое множество
+# отличается от ключа, которого в Redis ещё нет.
+LOADED = '-'
+
+# Есть ли в OfflineLike записи, ещё не сведённые с Redis. Новый
+# процесс этого не знает, поэтому первое обращение проверяет БД.
+offline_likes_pending = True
+offline_likes_lock = threading.Lock()
+
+
+def likers_key(kind, obj_id):
+    return f'likes:{kind}:{obj_id}'
+
+
+def mark_offline_likes():
+    global offline_likes_pending
+    with offline_likes_lock:
+        offline_likes_pending = True
+
+
+def reconcile_offline_likes(force=False):
+    """Сводит с Redis лайки, записанные в БД, пока Redis был недоступен.
+
+    Последнее действие такого пользователя уже в БД, поэтому его поле
+    убирается из хэшей несброшенных лайков, иначе сброс вернул бы
+    более старое действие. В загруженные множества лайкнувших
+    вносится состояние из БД. Записи хранятся в OfflineLike, поэтому
+    сведение переживает перезапуск и идёт в любом процессе; force —
+    проверить БД, даже если этот процесс сбоя не видел.
+    """
+    global offline_likes_pending
+    with offline_likes_lock:
+        if not (offline_likes_pending or force):
+            return
+        offline_likes_pending = False
+    try:
+        while True:
+            batch = list(
+                OfflineLike.objects
+                .order_by('pk')
+                .values_list(
+                    'pk', 'kind', 'object_id', 'user_id', 'updated_at'
+                )[:LIKES_FLUSH_BATCH_SIZE]
+            )
+            if not batch:
+                return
+            apply_offline_likes(
+                [(kind, obj_id, user_id) for _, kind, obj_id, user_id, _
+                 in batch]
+            )
+            # Запись, обновлённую за это время, оставляем до следующего
+            # раза: её действие новее прочитанного из БД.
+            OfflineLike.objects.filter(reduce(or_, [
+                Q(pk=pk, updated_at=updated_at)
+                for pk, _, _, _, updated_at in batch
+            ])).delete()
+            if len(batch) < LIKES_FLUSH_BATCH_SIZE:
+                return
+    except BaseException:
+        mark_offline_likes()
+        raise
+
+
+def apply_offline_likes(triples):
+    liked = set()
+    for kind in {kind for kind, _, _ in triples}:
+        through = SHARDED_MODELS[kind].users_like.through
+        pairs = [(obj_id, user_id) for k, obj_id, user_id in triples
+                 if k == kind]
+        liked.update(
+            (kind, obj_id, user_id)
+            for obj_id, user_id in through.objects
+            .filter(like_pairs(kind, pairs))
+            .values_list(f'{kind}_id', 'user_id')
+        )
+    keys = list({likers_key(kind, obj_id) for kind, obj_id, _ in triples})
+    pipe = REDIS.pipeline(transaction=False)
+    for key in keys:
+        pipe.exists(key)
+    loaded = {key for key, exists in zip(keys, pipe.execute()) if exists}
+    fields = [
+        f'{kind}:{obj_id}:{user_id}' for kind, obj_id, user_id in triples
+    ]
+    pipe = REDIS.pipeline()
+    pipe.hdel(PENDING_LIKES_KEY, *fields)
+    pipe.hdel(FLUSHING_LIKES_KEY, *fields)
+    for triple in triples:
+        key = likers_key(triple[0], triple[1])
+        if key not in loaded:
+            continue
+        if triple in liked:
+            pipe.sadd(key, triple[2])
+        else:
+            pipe.srem(key, triple[2])
+    pipe.execute()
+
+
+def load_like_sets(model, obj_ids):
+    """Загружает из БД множества лайкнувших, которых ещё нет в Redis.
+
+    Так Redis заполняется заново после холодного старта: по одному
+    запросу к БД на страницу и только для отсутствующих ключей.
+    """
+    kind = like_kind(model)
+    reconcile_offline_likes()
+    pipe = REDIS.pipeline(transaction=False)
+    for obj_id in obj_ids:
+        pipe.exists(likers_key(kind, obj_id))
+    missing = [
+        obj_id for obj_id, exists in zip(obj_ids, pipe.execute())
+        if not exists
+    ]
+    if not missing:
+        return missing
+    likers = defaultdict(list)
+    for obj_id, user_id in (
+        model.users_like.through.objects
+        .filter(**{f'{kind}_id__in': missing})
+        .values_list(f'{kind}_id', 'user_id')
+    ):
+        likers[obj_id].append(user_id)
+    pipe = REDIS.pipeline(transaction=False)
+    for obj_id in missing:
+        pipe.sadd(likers_key(kind, obj_id), LOADED, *likers[obj_id])
+    pipe.execute()
+    return missing
+
+
+def record_like(model, obj_id, user, liked):
+    """Ставит или снимает один лайк; см. record_likes."""
+    result = record_likes(user, [(model, obj_id, liked)])[0]
+    if result is None:
+        raise model.DoesNotExist
+    return result
+
+
+def record_likes(user, operations):
+    """Применяет пачку лайков одной транзакцией MULTI в Redis.
+
+    operations — список (модель, id, лайк или нет). Для каждой
+    операции возвращается пара (изменилось ли состояние, число
+    лайков) или None, если объекта нет. В БД изменения попадают
+    позже через flush_pending_likes; последнее действие пользователя
+    с объектом перезаписывает предыдущее. Если Redis недоступен,
+    лайки сразу пишутся в БД в одной транзакции.
+    """
+    try:
+        missing = missing_objects(operations)
+        pipe = REDIS.pipeline()
+        for model, obj_id, liked in operations:
+            if (model, obj_id) in missing:
+                continue
+            kind = like_kind(model)
+            key = likers_key(kind, obj_id)
+            if liked:
+                pipe.sadd(key, user.id)
+            else:
+                pipe.srem(key, user.id)
+            pipe.hset(
+                PENDING_LIKES_KEY, f'{kind}:{obj_id}:{user.id}', int(liked)
+            )
+            pipe.scard(key)
+        replies = iter(pipe.execute())
+    except RedisError:
+        return write_likes(user, operations)
+    results = []
+    for model, obj_id, _ in operations:
+        if (model, obj_id) in missing:
+            results.append(None)
+            continue
+        changed, _, count = next(replies), next(replies), next(replies)
+        results.append((bool(changed), count - 1))
+    return results
+
+
+def missing_objects(operations):
+    """Загружает множества лайкнувших и находит несуществующие объекты.
+
+    Существование проверяется только для только что загруженных
+    множеств: уже лежащие в Redis ключи созданы для живых объектов.
+    """
+    obj_ids = defaultdict(list)
+    for model, obj_id, _ in operations:
+        obj_ids[model].append(obj_id)
+    missing = set()
+    for model, ids in obj_ids.items():
+        loaded = load_like_sets(model, list(dict.fromkeys(ids)))
+        if not loaded:
+            continue
+        existing = set(
+            model.objects.filter(pk__in=loaded).values_list('pk', flat=True)
+        )
+        gone = [obj_id for obj_id in loaded if obj_id not in existing]
+        if gone:
+            REDIS.delete(*[
+                likers_key(like_kind(model), obj_id) for obj_id in gone
+            ])
+            missing.update((model, obj_id) for obj_id in gone)
+    return missing
+
+
+def write_likes(user, operations):
+    """Пишет лайки прямо в БД, пока Redis недоступен.
+
+    Каждая пара отмечается в OfflineLike в той же транзакции;
+    см. reconcile_offline_likes.
+    """
+    results = []
+    with transaction.atomic():
+        for model, obj_id, liked in operations:
+            try:
+                changed = set_like(model, obj_id, user, liked)
+            except model.DoesNotExist:
+                results.append(None)
+                continue
+            results.append((changed, None))
+            OfflineLike.objects.update_or_create(
+                kind=like_kind(model), object_id=obj_id, user=user
+            )
+        transaction.on_commit(mark_offline_likes)
+    return results
+
+
+def read_likes(objects, user):
+    """Число лайков из Redis и id объектов, лайкнутых пользователем.
+
+    Проставляет total_likes объектам и возвращает множество id;
+    если Redis недоступен — None.
+    """
+    model = type(objects[0])
+    kind = like_kind(model)
+    try:
+        load_like_sets(model, [obj.id for obj in objects])
+        pipe = REDIS.pipeline(transaction=False)
+        for obj in objects:
+            pipe.scard(likers_key(kind, obj.id))
+            if user.is_authenticated:
+                pipe.sismember(likers_key(kind, obj.id), user.id)
+        results = pipe.execute()
+    except RedisError:
+        return None
+    step = 2 if user.is_authenticated else 1
+    liked = set()
+    for index, obj in enumerate(objects):
+        obj.total_likes = results[index * step] - 1
+        if user.is_authenticated and results[index * step + 1]:
+            liked.add(obj.id)
+    return liked
+
+
+def get_like_state(user, objects):
+    """Лайки для объектов страницы: из Redis, а без него — из БД."""
+    objects = list(objects)
+    if not objects:
+        return set()
+    liked = read_likes(objects, user)
+    if liked is not None:
+        return liked
+    add_pending_likes(objects)
+    if isinstance(objects[0], Post):
+        return get_liked_post_ids(user, objects)
+    return get_liked_comment_ids(user, objects)
+
+
+def flush_pending_likes():
+    """Переносит накопленные в Redis лайки в таблицы users_like.
+
+    Хэш сначала атомарно переименовывается, как и при сбросе
+    просмотров; если прошлый сброс упал, он повторяется. Одновременно
+    сбрасывает один процесс; второй сразу возвращает 0.
+    """
+    with redis_lock(REDIS, FLUSH_LOCK_KEY, LIKES_FLUSH_LOCK_TTL) as locked:
+        if not locked:
+            return 0
+        return flush_likes()
+
+
+def flush_likes():
+    """Применяет сброшенный хэш ровно один раз; см. view_stats.flush_views.
+
+    Сначала сводятся лайки, записанные без Redis: сбрасывающий процесс
+    мог сбоя не видеть.
+    """
+    reconcile_offline_likes(force=True)
+    if not REDIS.exists(FLUSHING_LIKES_KEY):
+        if not REDIS.exists(PENDING_LIKES_KEY):
+            return 0
+        REDIS.rename(PENDING_LIKES_KEY, FLUSHING_LIKES_KEY)
+    REDIS.set(FLUSH_ID_KEY, uuid.uuid4().hex, nx=True)
+    flush_id = REDIS.get(FLUSH_ID_KEY).decode()
+    changes = defaultdict(dict)
+    for field, liked in REDIS.hgetall(FLUSHING_LIKES_KEY).items():
+        kind, obj_id, user_id = field.decode().split(':')
+        changes[kind][int(obj_id), int(user_id)] = liked == b'1'
+    with transaction.atomic():
+        _, created = LikeFlush.objects.get_or_create(flush_id=flush_id)
+        if created:
+            for kind, states in changes.items():
+                apply_like_changes(SHARDED_MODELS[kind], states)
+        LikeFlush.objects.filter(
+            created_at__lt=timezone.now()
+            - timedelta(seconds=LIKES_FLUSH_LOG_TTL)
+        ).delete()
+        transaction.on_commit(
+            lambda: REDIS.delete(FLUSHING_LIKES_KEY, FLUSH_ID_KEY)
+        )
+    if not created:
+        return 0
+    return sum(len(states) for states in changes.values())
+
+
+def apply_like_changes(model, states):
+    """Записывает состояния лайков и меняет счётчики на разницу.
+
+    Разница идёт через add_like_delta, как и в set_like: у объектов
+    с sharded_likes она попадает в случайный шард, а строка объекта
+    и уже накопленные шарды не трогаются до fold_like_shards.
+    """
+    kind = like_kind(model)
+    through = model.users_like.through
+    existing = set(
+        model.objects
+        .filter(pk__in={obj_id for obj_id, _ in states})
+        .values_list('pk', flat=True)
+    )
+    pairs = [pair for pair in states if pair[0] in existing]
+    stored = set()
+    for start in range(0, len(pairs), LIKES_FLUSH_BATCH_SIZE):
+        batch = pairs[start:start + LIKES_FLUSH_BATCH_SIZE]
+        stored.update(
+            through.objects
+            .filter(like_pairs(kind, batch))
+            .values_list(f'{kind}_id', 'user_id')
+        )
+    liked = [pair for pair in pairs if states[pair] and pair not in stored]
+    unliked = [pair for pair in pairs if not states[pair] and pair in stored]
+    through.objects.bulk_create(
+        [
+            through(**{f'{kind}_id': obj_id, 'user_id': user_id})
+            for obj_id, user_id in liked
+        ],
+        batch_size=LIKES_FLUSH_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    for start in range(0, len(unliked), LIKES_FLUSH_BATCH_SIZE):
+        through.objects.filter(
+            like_pairs(kind, unliked[start:start + LIKES_FLUSH_BATCH_SIZE])
+        ).delete()
+    deltas = Counter(obj_id for obj_id, _ in liked)
+    deltas.subtract(obj_id for obj_id, _ in unliked)
+    deltas = {obj_id: delta for obj_id, delta in deltas.items() if delta}
+    for obj_id, delta in deltas.items():
+        add_like_delta(model, obj_id, delta)
+    if model is Post:
+        rank_like_changes(deltas)
+
+
+def like_pairs(kind, pairs):
+    return reduce(or_, [
+        Q(**{f'{kind}_id': obj_id, 'user_id': user_id})
+        for obj_id, user_id in pairs
+    ])
+
+
+def rank_like_changes(deltas):
+    for post_id, category_id in (
+        Post.objects
+        .filter(pk__in=deltas, is_visible=True)
+        .values_list('pk', 'category_id')
+    ):
+        bump_hot_score(
+            post_id, category_id, HOT_LIKE_WEIGHT * deltas[post_id]
+        )
@@ -0,0 +1,235 @@
+import random
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from redis.exceptions import RedisError
+
+from .constants import HOT_LIKE_WEIGHT, LIKE_SHARD_CACHE_TTL, LIKE_SHARDS
+from .models import Comment, LikeShard, Post
+from .ranking import bump_post_by_id
+from .redis_client import REDIS
+
+
+SHARDED_MODELS = {'post': Post, 'comment': Comment}
+
+
+def like_kind(model):
+    return model._meta.model_name
+
+
+def like_lookup(model, obj_id, user):
+    return {f'{like_kind(model)}_id': obj_id, 'user_id': user.id}
+
+
+def shard_cache_key(kind, obj_id):
+    return f'likes:shards:{kind}:{obj_id}'
+
+
+def add_like_delta(model, obj_id, delta):
+    """Меняет счётчик лайков объекта на delta.
+
+    Обычные объекты обновляются в своей строке. Для объектов
+    с sharded_likes условие не совпадает, и delta уходит в случайный
+    шард из LikeShard, так что одновременные лайки одной публикации
+    не ждут друг друга на одной строке. Счётчик в строке не уходит
+    ниже нуля, даже если уже разошёлся с таблицей лайков: иначе
+    проверка PositiveIntegerField откатила бы весь сброс лайков.
+    """
+    updated = model.objects.filter(pk=obj_id, sharded_likes=False).update(
+        total_likes=Greatest(F('total_likes') + delta, 0)
+    )
+    if updated:
+        return
+    updated = LikeShard.objects.filter(
+        kind=like_kind(model),
+        object_id=obj_id,
+        shard=random.randrange(LIKE_SHARDS)
+    ).update(count=F('count') + delta)
+    if not updated:
+        raise model.DoesNotExist
+
+
+def set_like(model, obj_id, user, liked):
+    """Ставит или снимает лайк публикации или комментария.
+
+    Строка связи и счётчик total_likes меняются в одной транзакции,
+    счётчик — через F(), без пересчёта и без save() всего объекта.
+    Возвращает True, если состояние изменилось; повторный лайк
+    и снятие несуществующего лайка ничего не меняют.
+    """
+    through = model.users_like.through
+    lookup = like_lookup(model, obj_id, user)
+    with transaction.atomic():
+        if liked:
+            try:
+                with transaction.atomic():
+                    through.objects.create(**lookup)
+            except IntegrityError:
+                return False
+            delta = 1
+        else:
+            deleted, _ = through.objects.filter(**lookup).delete()
+            if not deleted:
+                return False
+            delta = -1
+        add_like_delta(model, obj_id, delta)
+    if model is Post:
+        bump_post_by_id(obj_id, HOT_LIKE_WEIGHT * delta)
+    return True
+
+
+def count_likes(model):
+    through = model.users_like.through
+    field = model._meta.model_name
+    return Coalesce(
+        Subquery(
+            through.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def recount_likes(queryset):
+    """Записывает в total_likes точное число лайков и обнуляет шарды.
+
+    Шарды блокируются до пересчёта, как в fold_object_shards: лайк,
+    записанный в шард параллельно, дождётся конца транзакции или
+    успеет попасть в подсчёт, но не обнулится без учёта.
+    """
+    model = queryset.model
+    with transaction.atomic():
+        shards = LikeShard.objects.filter(
+            kind=like_kind(model),
+            object_id__in=queryset.filter(sharded_likes=True).values('pk')
+        )
+        list(shards.select_for_update().values_list('pk', flat=True))
+        shards.update(count=0)
+        return queryset.update(total_likes=count_likes(model))
+
+
+def rebuild_like_counts(model):
+    """Пересчитывает total_likes всех объектов модели одним UPDATE."""
+    return recount_likes(model.objects.all())
+
+
+def enable_sharding(model, obj_id):
+    with transaction.atomic():
+        updated = model.objects.filter(pk=obj_id).update(sharded_likes=True)
+        LikeShard.objects.bulk_create(
+            [
+                LikeShard(kind=like_kind(model), object_id=obj_id, shard=shard)
+                for shard in range(LIKE_SHARDS)
+            ],
+            ignore_conflicts=True
+        )
+    return bool(updated)
+
+
+def disable_sharding(model, obj_id):
+    with transaction.atomic():
+        fold_object_shards(like_kind(model), obj_id)
+        LikeShard.objects.filter(
+            kind=like_kind(model), object_id=obj_id
+        ).delete()
+        return bool(
+            model.objects.filter(pk=obj_id).update(sharded_likes=False)
+        )
+
+
+def fold_object_shards(kind, obj_id):
+    """Переносит сумму шардов объекта в total_likes.
+
+    Шарды блокируются на время переноса, поэтому лайки, пришедшие
+    в эти шарды параллельно, не теряются, а ждут конца транзакции.
+    """
+    with transaction.atomic():
+        shards = list(
+            LikeShard.objects
+            .select_for_update()
+            .filter(kind=kind, object_id=obj_id)
+            .exclude(count=0)
+        )
+        total = sum(shard.count for shard in shards)
+        if total:
+            SHARDED_MODELS[kind].objects.filter(pk=obj_id).update(
+                total_likes=F('total_likes') + total
+            )
+        LikeShard.objects.filter(
+            pk__in=[shard.pk for shard in shards]
+        ).update(count=0)
+        transaction.on_commit(
+            lambda: forget_shard_sum(kind, obj_id)
+        )
+    return total
+
+
+def forget_shard_sum(kind, obj_id):
+    try:
+        REDIS.delete(shard_cache_key(kind, obj_id))
+    except RedisError:
+        pass
+
+
+def fold_like_shards():
+    pending = (
+        LikeShard.objects
+        .exclude(count=0)
+        .values_list('kind', 'object_id')
+        .distinct()
+    )
+    folded = 0
+    for kind, obj_id in pending:
+        fold_object_shards(kind, obj_id)
+        folded += 1
+    return folded
+
+
+def add_pending_likes(objects):
+    """Прибавляет к total_likes ещё не перенесённые суммы шардов.
+
+    Суммы кэшируются в Redis на LIKE_SHARD_CACHE_TTL секунд; для
+    страницы без шардированных объектов запросов нет совсем.
+    """
+    sharded = [obj for obj in objects if obj.sharded_likes]
+    if not sharded:
+        return
+    kind = like_kind(type(sharded[0]))
+    keys = [shard_cache_key(kind, obj.id) for obj in sharded]
+    try:
+        cached = REDIS.mget(keys)
+    except RedisError:
+        cached = [None] * len(keys)
+    missing = [
+        obj.id for obj, value in zip(sharded, cached) if value is None
+    ]
+    sums = {}
+    if missing:
+        sums = dict(
+            LikeShard.objects
+            .filter(kind=kind, object_id__in=missing)
+            .values('object_id')
+            .annotate(total=Sum('count'))
+            .values_list('object_id', 'total')
+        )
+        try:
+            pipe = REDIS.pipeline(transaction=False)
+            for obj_id in missing:
+                pipe.set(
+                    shard_cache_key(kind, obj_id),
+                    sums.get(obj_id, 0),
+                    ex=LIKE_SHARD_CACHE_TTL
+                )
+            pipe.execute()
+        except RedisError:
+            pass
+    for obj, value in zip(sharded, cached):
+        obj.total_likes += int(value) if value is not None else sums.get(
+            obj.id, 0
+        )
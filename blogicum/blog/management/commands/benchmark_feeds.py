@@ -0,0 +1,105 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.follows import rebuild_follow_counts
+from blog.models import Category, Contact, Post, User
+from blog.utils import get_user_posts, posts_queryset
+
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы и время запросов лент на текущей схеме. '
+            'Для сравнения запустите до и после '
+            '`migrate blog 0010_feed_indexes` на отдельной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Сколько публикаций сгенерировать перед замером.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз повторять каждый запрос.'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        category = Category.objects.filter(is_published=True).first()
+        author = User.objects.filter(posts__isnull=False).first()
+        if not category or not author:
+            self.stderr.write('Нет данных: запустите с --seed.')
+            return
+        queries = {
+            'index': posts_queryset(Post.objects),
+            'category': posts_queryset(category.posts),
+            'profile': get_user_posts(author.posts),
+            'follow': Contact.objects.filter(
+                user_from=author, user_to_id=author.id + 1
+            ),
+        }
+        self.stdout.write(f'Публикаций: {Post.objects.count()}')
+        self.measure(queries, options['repeat'])
+
+    def measure(self, queries, repeat):
+        for name, queryset in queries.items():
+            if name != 'follow':
+                queryset = queryset.order_by('-pub_date', '-id')[:11]
+            self.stdout.write(f'-- {name}\n{queryset.explain()}')
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f'{name}: {elapsed:.2f} мс\n')
+
+    def seed(self, total):
+        now = timezone.now()
+        users = [
+            User.objects.get_or_create(username=f'bench_{number}')[0]
+            for number in range(100)
+        ]
+        categories = [
+            Category.objects.get_or_create(
+                slug=f'bench-{number}',
+                defaults={'title': f'Bench {number}', 'description': '-'}
+            )[0]
+            for number in range(20)
+        ]
+        Contact.objects.bulk_create(
+            [
+                Contact(user_from=user_from, user_to=user_to)
+                for user_from in users for user_to in users
+                if user_from != user_to
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        rebuild_follow_counts()
+        for offset in range(0, total, BATCH_SIZE):
+            posts = []
+            for _ in range(min(BATCH_SIZE, total - offset)):
+                pub_date = now - timedelta(
+                    minutes=random.randint(-10000, 5000000)
+                )
+                is_published = random.random() > 0.05
+                posts.append(Post(
+                    title='bench',
+                    text='bench',
+                    author=random.choice(users),
+                    category=random.choice(categories),
+                    pub_date=pub_date,
+                    is_published=is_published,
+                    is_visible=is_published and pub_date <= now,
+                ))
+            Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+            self.stdout.write(f'Создано {offset + len(posts)} из {total}')
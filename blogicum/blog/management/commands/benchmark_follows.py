@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.follows import create_follow_stats, follow, unfollow
+from blog.models import Contact, FollowStats, User
+
+
+BATCH_SIZE = 10000
+BENCH_AUTHOR = 'bench_star'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет подписку, отписку и проверку подписки для автора '
+            'с большим числом подписчиков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Сколько подписчиков создать автору перед замером '
+                 '(например, 1000000).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=100,
+            help='Сколько раз повторять каждую операцию.'
+        )
+
+    def handle(self, *args, **options):
+        author, _ = User.objects.get_or_create(username=BENCH_AUTHOR)
+        if options['seed']:
+            self.seed(author, options['seed'])
+        follower = (
+            User.objects.filter(rel_from_set__user_to=author)
+            .order_by('-id').first()
+        )
+        newcomer, _ = User.objects.get_or_create(
+            username=f'{BENCH_AUTHOR}_newcomer'
+        )
+        if not follower:
+            self.stderr.write('Нет подписчиков: запустите с --seed.')
+            return
+        unfollow(newcomer, author)
+        self.stdout.write(
+            'Подписчиков: '
+            f'{Contact.objects.filter(user_to=author).count()}'
+        )
+        lookup = Contact.objects.filter(user_from=follower, user_to=author)
+        self.stdout.write(f'-- is_following\n{lookup.explain()}')
+        self.measure('is_following', options['repeat'], lookup.exists)
+        self.measure(
+            'follow + unfollow', options['repeat'],
+            lambda: (follow(newcomer, author), unfollow(newcomer, author))
+        )
+        self.measure(
+            'repeated follow', options['repeat'],
+            lambda: follow(follower, author)
+        )
+
+    def measure(self, name, repeat, operation):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            operation()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        self.stdout.write(f'{name}: {elapsed:.3f} мс')
+
+    def seed(self, author, total):
+        start = User.objects.filter(
+            username__startswith=f'{BENCH_AUTHOR}_'
+        ).count()
+        for offset in range(start, start + total, BATCH_SIZE):
+            count = min(BATCH_SIZE, start + total - offset)
+            users = User.objects.bulk_create([
+                User(username=f'{BENCH_AUTHOR}_{number}')
+                for number in range(offset, offset + count)
+            ])
+            if not users[0].pk:
+                users = User.objects.filter(
+                    username__in=[user.username for user in users]
+                )
+            Contact.objects.bulk_create(
+                [Contact(user_from=user, user_to=author) for user in users],
+                batch_size=BATCH_SIZE
+            )
+            self.stdout.write(
+                f'Создано {offset - start + count} из {total}'
+            )
+        FollowStats.objects.filter(user=author).delete()
+        create_follow_stats(author.id)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from blog.constants import UPLOAD_ATTACH_DELAY, UPLOAD_EXPIRY
+from blog.uploads import attach_pending_uploads, clean_uploads
+
+
+class Command(BaseCommand):
+    help = ('Привязывает фото, привязка которых не завершилась, '
+            'и удаляет брошенные загрузки фото частями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--expiry', type=int, default=UPLOAD_EXPIRY,
+            help='Удалять загрузки, не менявшиеся столько секунд.'
+        )
+        parser.add_argument(
+            '--attach-delay', type=int, default=UPLOAD_ATTACH_DELAY,
+            help='Повторять привязку фото к публикации, если её '
+                 'не сделали за столько секунд.'
+        )
+
+    def handle(self, *args, **options):
+        attached = attach_pending_uploads(options['attach_delay'])
+        removed = clean_uploads(options['expiry'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Привязано фото: {attached}, удалено загрузок: {removed}'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from blog.constants import MEDIA_GC_GRACE
+from blog.media import collect_garbage
+
+
+class Command(BaseCommand):
+    help = ('Удаляет фото публикаций и их миниатюры, '
+            'на которые больше никто не ссылается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=MEDIA_GC_GRACE,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать файлы, ничего не удаляя.'
+        )
+
+    def handle(self, *args, **options):
+        removed = collect_garbage(options['grace'], options['dry_run'])
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} ненужных файлов: {removed}')
+        )
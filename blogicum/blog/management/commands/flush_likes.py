@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.like_store import flush_pending_likes
+
+
+class Command(BaseCommand):
+    help = 'Сбрасывает накопленные в Redis лайки в таблицы users_like.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Запускать в цикле с паузой в секундах; '
+                 'без параметра выполняется один раз (для cron).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            flushed = flush_pending_likes()
+            if flushed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Сохранено лайков: {flushed}')
+                )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.view_stats import flush_pending_views
+
+
+class Command(BaseCommand):
+    help = 'Сбрасывает накопленные в Redis просмотры в Post.views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Запускать в цикле с паузой в секундах; '
+                 'без параметра выполняется один раз (для cron).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            flushed = flush_pending_views()
+            if flushed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Обновлено публикаций: {flushed}')
+                )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.likes import fold_like_shards
+
+
+class Command(BaseCommand):
+    help = 'Переносит суммы шардов лайков в total_likes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Запускать в цикле с паузой в секундах; '
+                 'без параметра выполняется один раз (для cron).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            folded = fold_like_shards()
+            if folded:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Обновлено объектов: {folded}')
+                )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog.constants import THUMBNAIL_BATCH_SIZE
+from blog.images import thumbnail_job
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры и заглушки для фото публикаций, '
+            'у которых их ещё нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать миниатюры и для уже обработанных фото.'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Повторить и фото, обработка которых уже падала.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков, которые сжимают фото.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            posts = posts.filter(
+                Q(image_width__isnull=True) | Q(image_placeholder='')
+            )
+        if not (options['force'] or options['retry_failed']):
+            # Битый файл падает при каждой попытке: такие фото
+            # повторяются только по --retry-failed.
+            posts = posts.filter(image_error='')
+        posts = posts.order_by('id').values_list('id', flat=True)
+        done = failed = last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # Id читаются пачками, а не одним курсором: воркеры
+            # тем временем пишут в ту же таблицу.
+            while True:
+                post_ids = list(
+                    posts.filter(id__gt=last_id)[:THUMBNAIL_BATCH_SIZE]
+                )
+                if not post_ids:
+                    break
+                last_id = post_ids[-1]
+                futures = [
+                    pool.submit(thumbnail_job, post_id, options['force'])
+                    for post_id in post_ids
+                ]
+                for post_id, future in zip(post_ids, futures):
+                    try:
+                        done += int(future.result())
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f'Публикация {post_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано фото: {done}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.models import Post
+from blog.timeline import fan_out_post
+
+
+def publish_due_posts():
+    due_posts = list(Post.objects.filter(
+        is_visible=False,
+        is_published=True,
+        category__is_published=True,
+        pub_date__lte=timezone.now()
+    ))
+    Post.objects.filter(
+        id__in=[post.id for post in due_posts]
+    ).update(is_visible=True)
+    for post in due_posts:
+        post.is_visible = True
+        fan_out_post(post)
+    return len(due_posts)
+
+
+class Command(BaseCommand):
+    help = ('Открывает в ленте отложенные публикации, '
+            'у которых наступила дата публикации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Запускать в цикле с паузой в секундах; '
+                 'без параметра выполняется один раз (для cron).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            published = publish_due_posts()
+            if published:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Опубликовано: {published}')
+                )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blog.follows import rebuild_follow_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики подписчиков и подписок.'
+
+    def handle(self, *args, **options):
+        updated = rebuild_follow_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано пользователей: {updated}')
+        )
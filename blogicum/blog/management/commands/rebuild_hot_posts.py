@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.ranking import rebuild_hot_posts
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает рейтинг популярных публикаций в Redis '
+            'и сдвигает эпоху, чтобы оценки не переполнялись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='За сколько дней учитывать публикации.'
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        rebuilt = rebuild_hot_posts(since)
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано рейтингов: {rebuilt}')
+        )
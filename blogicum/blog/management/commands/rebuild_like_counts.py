@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.likes import rebuild_like_counts
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает total_likes публикаций и комментариев.'
+
+    def handle(self, *args, **options):
+        posts = rebuild_like_counts(Post)
+        comments = rebuild_like_counts(Comment)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано публикаций: {posts}, комментариев: {comments}'
+        ))
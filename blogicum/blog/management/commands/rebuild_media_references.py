@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blog.media import rebuild_media_references
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает, сколько публикаций ссылается на каждое фото.'
+
+    def handle(self, *args, **options):
+        updated = rebuild_media_references()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано файлов: {updated}')
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.view_stats import flush_pending_views, move_legacy_views
+
+
+class Command(BaseCommand):
+    help = ('Сводит просмотры из Redis и Post.views: переносит старые '
+            'счётчики post:<id>:views и сбрасывает накопленную дельту.')
+
+    def handle(self, *args, **options):
+        moved = move_legacy_views()
+        flushed = flush_pending_views()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено старых счётчиков: {moved}, '
+            f'сброшено дельт: {flushed}'
+        ))
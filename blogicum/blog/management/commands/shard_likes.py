@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.likes import SHARDED_MODELS, disable_sharding, enable_sharding
+
+
+class Command(BaseCommand):
+    help = ('Включает шардированный счётчик лайков для популярных '
+            'публикаций или комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(SHARDED_MODELS))
+        parser.add_argument('ids', nargs='+', type=int)
+        parser.add_argument(
+            '--off',
+            action='store_true',
+            help='Перенести шарды в total_likes и выключить шардирование.'
+        )
+
+    def handle(self, *args, **options):
+        model = SHARDED_MODELS[options['kind']]
+        toggle = disable_sharding if options['off'] else enable_sharding
+        for obj_id in options['ids']:
+            if not toggle(model, obj_id):
+                raise CommandError(f'Объект {obj_id} не найден')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано объектов: {len(options["ids"])}'
+        ))
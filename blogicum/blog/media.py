@@ -0,0 +1,155 @@
+import posixpath
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .constants import MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE
+from .images import thumbnail_original
+from .models import MediaFile, Post
+
+
+POST_IMAGES_DIR = Post._meta.get_field('image').upload_to
+
+
+def add_reference(name):
+    if not name:
+        return
+    updated = MediaFile.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, references=1)
+    except IntegrityError:
+        MediaFile.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def drop_reference(name):
+    if name:
+        MediaFile.objects.filter(name=name, references__gt=0).update(
+            references=F('references') - 1
+        )
+
+
+def count_references():
+    return Coalesce(
+        Subquery(
+            Post.objects
+            .filter(image=OuterRef('name'))
+            .order_by()
+            .values('image')
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def rebuild_media_references():
+    """Заводит недостающие MediaFile и пересчитывает ссылки.
+
+    Имена фото читаются из БД пачками, а счётчики пересчитываются
+    одним UPDATE с подзапросом.
+    """
+    names = (
+        Post.objects
+        .exclude(image='')
+        .exclude(image__isnull=True)
+        .order_by('image')
+        .values_list('image', flat=True)
+        .distinct()
+        .iterator(chunk_size=MEDIA_GC_BATCH_SIZE)
+    )
+    for batch in batched(names, MEDIA_GC_BATCH_SIZE):
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name) for name in batch],
+            ignore_conflicts=True
+        )
+    return MediaFile.objects.update(references=count_references())
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def walk_storage(storage, path):
+    """Имена всех файлов под path; каталоги читаются по одному."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield posixpath.join(path, filename)
+    for directory in directories:
+        yield from walk_storage(storage, posixpath.join(path, directory))
+
+
+def collect_garbage(grace=MEDIA_GC_GRACE, dry_run=False):
+    """Удаляет фото и миниатюры, на которые не ссылается ни одна публикация.
+
+    Хранилище обходится потоком и сверяется с MediaFile пачками
+    по MEDIA_GC_BATCH_SIZE имён, так что ни файлы, ни строки целиком
+    в память не загружаются. Файлы моложе grace секунд не трогаются:
+    их публикация может быть ещё не сохранена.
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    removed = 0
+    for names in batched(
+        walk_storage(default_storage, POST_IMAGES_DIR), MEDIA_GC_BATCH_SIZE
+    ):
+        removed += collect_batch(default_storage, names, cutoff, dry_run)
+    return removed
+
+
+def collect_batch(storage, names, cutoff, dry_run):
+    """Удаляет из names файлы без ссылок; возвращает их число.
+
+    Время изменения файлов запрашивается до транзакции, чтобы
+    не держать блокировки на время запросов к хранилищу. Под
+    блокировкой строк всех кандидатов, в том числе с нулём ссылок,
+    проверяется только число ссылок, а файл удаляется, только если
+    его строку действительно удалили или её не было вовсе. Если ссылка
+    появилась между чтением и удалением, строка остаётся, и файл
+    не трогается.
+    """
+    names = [
+        name for name in names if storage.get_modified_time(name) < cutoff
+    ]
+    if not names:
+        return 0
+    owners = {name: thumbnail_original(name) or name for name in names}
+    with transaction.atomic():
+        references = dict(
+            MediaFile.objects
+            .select_for_update()
+            .filter(name__in=set(owners.values()))
+            .values_list('name', 'references')
+        )
+        garbage = [
+            name for name, owner in owners.items()
+            if not references.get(owner)
+        ]
+        if dry_run or not garbage:
+            return len(garbage)
+        unused = {owners[name] for name in garbage}
+        MediaFile.objects.filter(name__in=unused, references=0).delete()
+        kept = set(
+            MediaFile.objects
+            .filter(name__in=unused)
+            .values_list('name', flat=True)
+        )
+        garbage = [name for name in garbage if owners[name] not in kept]
+        for name in garbage:
+            storage.delete(name)
+    return len(garbage)
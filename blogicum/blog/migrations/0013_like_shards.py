@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'публикация'), ('comment', 'комментарий')], max_length=16)),
+                ('object_id', models.PositiveIntegerField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'шард лайков',
+                'verbose_name_plural': 'Шарды лайков',
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='sharded_likes',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лайки в шардах'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='sharded_likes',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лайки в шардах'),
+        ),
+        migrations.AddConstraint(
+            model_name='likeshard',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'shard'), name='unique_like_shard'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Contact = apps.get_model('blog', 'Contact')
+    first_follows = (
+        Contact.objects
+        .order_by()
+        .values('user_from', 'user_to')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    Contact.objects.exclude(id__in=first_follows).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_like_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='contact',
+            constraint=models.UniqueConstraint(fields=('user_from', 'user_to'), name='unique_follow'),
+        ),
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='blog_contac_user_fr_c74a8c_idx',
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_contacts(Contact, field):
+    return Coalesce(
+        Subquery(
+            Contact.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def fill_follow_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Contact = apps.get_model('blog', 'Contact')
+    FollowStats = apps.get_model('blog', 'FollowStats')
+    users = User.objects.annotate(
+        followers=count_contacts(Contact, 'user_to'),
+        following=count_contacts(Contact, 'user_from'),
+    ).values_list('pk', 'followers', 'following')
+    FollowStats.objects.bulk_create(
+        [
+            FollowStats(
+                user_id=user_id,
+                followers_count=followers,
+                following_count=following
+            )
+            for user_id, followers, following in users.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0014_unique_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follow_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'счётчики подписок',
+                'verbose_name_plural': 'Счётчики подписок',
+            },
+        ),
+        migrations.RunPython(fill_follow_stats, migrations.RunPython.noop),
+    ]
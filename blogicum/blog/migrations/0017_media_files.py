@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:16
+
+import blog.fields
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_media_files(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    MediaFile = apps.get_model('blog', 'MediaFile')
+    images = (
+        Post.objects
+        .exclude(image='')
+        .exclude(image__isnull=True)
+        .order_by()
+        .values('image')
+        .annotate(total=Count('id'))
+        .values_list('image', 'total')
+    )
+    MediaFile.objects.bulk_create(
+        [
+            MediaFile(name=name, references=total)
+            for name, total in images.iterator()
+        ],
+        batch_size=1000
+    )
+    # Миниатюры теперь называются по полному имени оригинала;
+    # до перегенерации (generate_thumbnails) показывается оригинал.
+    Post.objects.exclude(image_width=None).update(
+        image_width=None, image_height=None
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_post_image_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=blog.fields.ContentAddressedImageField(blank=True, null=True, upload_to='posts_images', verbose_name='Фото к постам'),
+        ),
+        migrations.RunPython(fill_media_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_view_flush'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_error',
+            field=models.TextField(blank=True, editable=False, help_text='Почему не удалось обработать фото; пусто — ошибок не было.'),
+        ),
+    ]
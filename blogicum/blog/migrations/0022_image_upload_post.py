@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_post_image_error'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='post',
+            field=models.ForeignKey(blank=True, help_text='Публикация, к которой фото привяжется после проверки.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='image_uploads', to='blog.post'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0022_image_upload_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flush_id', models.CharField(max_length=32, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'сброс лайков',
+                'verbose_name_plural': 'Сбросы лайков',
+            },
+        ),
+    ]
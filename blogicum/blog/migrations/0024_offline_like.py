@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0023_like_flush'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfflineLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'публикация'), ('comment', 'комментарий')], max_length=16)),
+                ('object_id', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'лайк без Redis',
+                'verbose_name_plural': 'Лайки без Redis',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='offlinelike',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'user'), name='unique_offline_like'),
+        ),
+    ]
@@ -1,8 +1,15 @@
+import uuid
+
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from django.http import HttpResponseBadRequest
+from django.utils import timezone
 
-from .models import Comment
+from .models import Comment, ImageUpload
+from .like_store import get_like_state
+from .pagination import KeysetPaginator
+from .uploads import has_image_header, schedule_attach
 
 
 class OnlyAuthorMixin(UserPassesTestMixin):
@@ -31,3 +38,70 @@ class AjaxRequiredMixin:
         if not request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
                 return HttpResponseBadRequest()
         return super().dispatch(request, *args, **kwargs)
+
+
+class KeysetPaginationMixin:
+    paginator_class = KeysetPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.paginator_class(queryset, page_size)
+        page = paginator.page(
+            cursor=self.request.GET.get('cursor'),
+            number=self.request.GET.get(self.page_kwarg),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class LikedPostsMixin:
+    """Id публикаций страницы, которые лайкнул пользователь.
+
+    Один запрос к Redis или к БД на страницу вместо двух запросов
+    в каждой карточке; заодно проставляет актуальные total_likes.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['liked_post_ids'] = get_like_state(
+            self.request.user, context['object_list']
+        )
+        return context
+
+
+class ImageUploadMixin:
+    """Привязывает к публикации фото, загруженное частями.
+
+    Токен загрузки приходит в поле upload_token рядом с формой,
+    а файла в самой форме нет. Заголовок файла проверяется до приёма
+    формы; публикация сохраняется сразу, полная проверка и сохранение
+    фото идут в фоновом пуле после коммита. Загрузка запоминает
+    публикацию, поэтому пропавшее задание повторит clean_uploads.
+    """
+
+    def form_valid(self, form):
+        token = self.request.POST.get('upload_token')
+        upload = self.get_upload(token) if token else None
+        if token and (upload is None or not upload.is_complete):
+            form.add_error(None, 'Фото ещё не загружено полностью.')
+            return self.form_invalid(form)
+        if upload and not has_image_header(upload):
+            form.add_error(None, 'Загруженный файл не похож на фото.')
+            return self.form_invalid(form)
+        response = super().form_valid(form)
+        if upload:
+            post_id = self.object.id
+            ImageUpload.objects.filter(token=upload.token).update(
+                post_id=post_id, updated_at=timezone.now()
+            )
+            transaction.on_commit(
+                lambda: schedule_attach(post_id, upload.token)
+            )
+        return response
+
+    def get_upload(self, token):
+        try:
+            token = uuid.UUID(token)
+        except ValueError:
+            return None
+        return ImageUpload.objects.filter(
+            token=token, user=self.request.user
+        ).first()
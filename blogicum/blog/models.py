@@ -1,8 +1,12 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.http import int_to_base36
 
 from core.models import PublishedModel
-from .constants import MAX_LENGTH
+from .fields import ContentAddressedImageField
+from .constants import COMMENT_PATH_LENGTH, COMMENT_PATH_SEGMENT, MAX_LENGTH
 
 
 User = get_user_model()
@@ -88,23 +92,65 @@ class Post(PublishedModel):
         verbose_name='Категория',
         related_name='posts'
     )
-    image = models.ImageField(
+    image = ContentAddressedImageField(
         upload_to='posts_images',
         null=True,
         blank=True,
         verbose_name='Фото к постам'
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Заполняется, когда готовы миниатюры фото.'
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        help_text='Крошечная копия фото (data URI), видная до его загрузки.'
+    )
+    image_error = models.TextField(
+        blank=True,
+        editable=False,
+        help_text='Почему не удалось обработать фото; пусто — ошибок не было.'
+    )
     users_like = models.ManyToManyField(
         User,
         related_name='posts_liked',
         blank=True
     )
     total_likes = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    views = models.PositiveBigIntegerField(default=0)
+    is_visible = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Видна в ленте'
+    )
+    sharded_likes = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лайки в шардах'
+    )
 
     class Meta:
         indexes = [
             models.Index(fields=['-pub_date']),
             models.Index(fields=['-total_likes']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                condition=models.Q(is_visible=True),
+                name='blog_post_visible_feed_idx'
+            ),
+            models.Index(
+                fields=['category', '-pub_date', '-id'],
+                condition=models.Q(is_visible=True),
+                name='blog_post_category_feed_idx'
+            ),
         ]
         ordering = ['-pub_date']
         verbose_name = 'публикация'
@@ -114,6 +160,26 @@ class Post(PublishedModel):
         title = str(self.title)
         return title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Имя фото, загруженное из БД: по нему сигналы узнают, на какой
+        # файл публикация ссылалась до сохранения. None — поле отложено.
+        post.saved_image = post.__dict__.get('image')
+        # Видимость из БД: рассылка в ленты идёт только при переходе
+        # из невидимой в видимую, а не на каждое сохранение.
+        post.saved_visible = post.__dict__.get('is_visible')
+        return post
+
+
+def comment_path_segment(comment_id):
+    """Id комментария в base36 фиксированной ширины.
+
+    Одинаковая ширина сегментов нужна, чтобы строковая сортировка
+    путей совпадала с порядком id внутри каждой ветки.
+    """
+    return int_to_base36(comment_id).rjust(COMMENT_PATH_SEGMENT, '0')
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
@@ -128,6 +194,23 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         null=True
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name='Ответ на комментарий'
+    )
+    path = models.CharField(
+        max_length=COMMENT_PATH_LENGTH,
+        blank=True,
+        editable=False,
+        help_text='Идентификаторы предков и самого комментария '
+                  'в base36 через «/»; сортировка по нему даёт дерево.'
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
     text = models.TextField(
         verbose_name='Текст'
     )
@@ -138,11 +221,17 @@ class Comment(models.Model):
         blank=True
     )
     total_likes = models.PositiveIntegerField(default=0)
+    sharded_likes = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лайки в шардах'
+    )
 
     class Meta:
         indexes = [
             models.Index(fields=['created_at']),
             models.Index(fields=['-total_likes']),
+            models.Index(fields=['post', 'path']),
         ]
         ordering = ['created_at']
         verbose_name = 'комментарий'
@@ -152,6 +241,161 @@ class Comment(models.Model):
         return self.text
 
 
+class LikeShard(models.Model):
+    """Часть счётчика лайков популярной публикации или комментария.
+
+    Лайки раскладываются по случайным шардам, чтобы не блокировать
+    одну строку объекта; сумма шардов периодически переносится
+    в total_likes. Значение шарда может быть отрицательным.
+    """
+
+    kind = models.CharField(
+        max_length=16,
+        choices=(('post', 'публикация'), ('comment', 'комментарий'))
+    )
+    object_id = models.PositiveIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'shard'],
+                name='unique_like_shard'
+            ),
+        ]
+        verbose_name = 'шард лайков'
+        verbose_name_plural = 'Шарды лайков'
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} #{self.shard}: {self.count}'
+
+
+class ViewFlush(models.Model):
+    """Сброс просмотров из Redis, уже записанный в Post.views.
+
+    Если удалить сброшенный хэш из Redis не удалось, следующий запуск
+    найдёт его flush_id здесь и не прибавит просмотры второй раз.
+    """
+
+    flush_id = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'сброс просмотров'
+        verbose_name_plural = 'Сбросы просмотров'
+
+    def __str__(self):
+        return self.flush_id
+
+
+class OfflineLike(models.Model):
+    """Лайк, записанный прямо в БД, пока Redis был недоступен.
+
+    Когда Redis вернётся, более старое действие того же пользователя
+    с тем же объектом убирается из несброшенных лайков в Redis.
+    """
+
+    kind = models.CharField(
+        max_length=16,
+        choices=(('post', 'публикация'), ('comment', 'комментарий'))
+    )
+    object_id = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'user'],
+                name='unique_offline_like'
+            ),
+        ]
+        verbose_name = 'лайк без Redis'
+        verbose_name_plural = 'Лайки без Redis'
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.user_id}'
+
+
+class LikeFlush(models.Model):
+    """Сброс лайков из Redis, уже записанный в таблицы users_like.
+
+    Как ViewFlush: если хэш не удалился после коммита, следующий
+    запуск найдёт его flush_id и не применит лайки второй раз.
+    """
+
+    flush_id = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'сброс лайков'
+        verbose_name_plural = 'Сбросы лайков'
+
+    def __str__(self):
+        return self.flush_id
+
+
+class MediaFile(models.Model):
+    """Файл фото в хранилище и число публикаций, которые на него ссылаются.
+
+    Файлы без ссылок не удаляются сразу: их забирает команда
+    collect_media_garbage.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
+
+
+class ImageUpload(models.Model):
+    """Фото, которое загружается частями до отправки формы публикации.
+
+    Части дописываются в файл UPLOADS_DIR/<token>.part; received —
+    сколько байт уже записано, с этого места загрузка продолжается.
+    post задаётся, когда форма публикации принята: пока строка есть,
+    привязку фото можно повторить, даже если фоновое задание пропало.
+    """
+
+    token = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='image_uploads',
+        help_text='Публикация, к которой фото привяжется после проверки.'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'загрузка фото'
+        verbose_name_plural = 'Загрузки фото'
+
+    def __str__(self):
+        return f'{self.filename}: {self.received}/{self.size}'
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
+
+
 class Contact(models.Model):
     user_from = models.ForeignKey(
         'auth.User',
@@ -166,8 +410,15 @@ class Contact(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_from', 'user_to'],
+                name='unique_follow'
+            ),
+        ]
         indexes = [
             models.Index(fields=['-created']),
+            models.Index(fields=['user_to', 'user_from']),
         ]
         ordering = ['-created']
 
@@ -175,6 +426,30 @@ class Contact(models.Model):
         return f'{self.user_from} follows {self.user_to}'
 
 
+class FollowStats(models.Model):
+    """Число подписчиков и подписок пользователя.
+
+    Меняется вместе со строками Contact, чтобы профиль и раздача
+    ленты не считали подписчиков каждый раз.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='follow_stats'
+    )
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'счётчики подписок'
+        verbose_name_plural = 'Счётчики подписок'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.followers_count}/{self.following_count}'
+
+
 User.add_to_class(
     'following',
     models.ManyToManyField(
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+from .constants import MAX_OFFSET_PAGES
+
+
+def encode_cursor(moment, pk, reverse=False):
+    payload = json.dumps(
+        [moment.isoformat(), pk, int(reverse)],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment, pk, reverse = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        moment = parse_datetime(moment)
+        if moment is None:
+            raise ValueError
+        return moment, int(pk), bool(reverse)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise Http404('Неверный курсор страницы')
+
+
+class KeysetPage:
+    """Страница ленты без OFFSET и COUNT(*)."""
+
+    def __init__(self, object_list, paginator, number=None,
+                 has_next=False, has_previous=False):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.cursor(self.object_list[0], reverse=True)
+        return None
+
+
+class KeysetPaginator:
+    """Курсорная пагинация по ключу (field, id).
+
+    По умолчанию — публикации от новых к старым по pub_date. Старые
+    ссылки вида ?page=N обслуживаются через OFFSET только для первых
+    MAX_OFFSET_PAGES страниц.
+    """
+
+    def __init__(self, queryset, per_page, field='pub_date',
+                 descending=True):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+        self.descending = descending
+
+    def cursor(self, obj, reverse=False):
+        return encode_cursor(getattr(obj, self.field), obj.id, reverse)
+
+    def ordering(self, reverse=False):
+        if self.descending != reverse:
+            return (f'-{self.field}', '-id')
+        return (self.field, 'id')
+
+    def after(self, moment, pk, reverse=False):
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        return (
+            Q(**{f'{self.field}__{lookup}': moment})
+            | Q(**{self.field: moment, f'id__{lookup}': pk})
+        )
+
+    def page(self, cursor=None, number=None):
+        if cursor:
+            return self._page_from_cursor(*decode_cursor(cursor))
+        return self._page_from_number(number)
+
+    def _page_from_number(self, number):
+        try:
+            number = int(number or 1)
+        except (TypeError, ValueError):
+            raise Http404('Неверный номер страницы')
+        if not 1 <= number <= MAX_OFFSET_PAGES:
+            raise Http404('Неверный номер страницы')
+        offset = (number - 1) * self.per_page
+        rows = list(
+            self.queryset.order_by(*self.ordering())
+            [offset:offset + self.per_page + 1]
+        )
+        if not rows and number > 1:
+            raise Http404('Неверный номер страницы')
+        return KeysetPage(
+            rows[:self.per_page], self, number=number,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def _page_from_cursor(self, moment, pk, reverse):
+        rows = list(
+            self.queryset
+            .filter(self.after(moment, pk, reverse))
+            .order_by(*self.ordering(reverse))[:self.per_page + 1]
+        )
+        if reverse:
+            return KeysetPage(
+                rows[:self.per_page][::-1], self,
+                has_next=True,
+                has_previous=len(rows) > self.per_page,
+            )
+        return KeysetPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
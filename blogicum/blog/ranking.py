@@ -0,0 +1,201 @@
+import time
+
+from redis.exceptions import RedisError, WatchError
+
+from .constants import (
+    HOT_COMMENT_WEIGHT, HOT_HALF_LIFE, HOT_LIKE_WEIGHT, HOT_POSTS_SIZE,
+    HOT_REBASE_EXPONENT, HOT_VIEW_WEIGHT
+)
+from .models import Post
+from .redis_client import REDIS
+
+
+HOT_EPOCH_KEY = 'hot:epoch'
+HOT_BUMP_ATTEMPTS = 3
+
+
+def hot_key(category_id=None):
+    if category_id:
+        return f'hot:category:{category_id}'
+    return 'hot:all'
+
+
+def decayed(weight, timestamp, epoch):
+    """Вес события, приведённый к общей шкале.
+
+    Рейтинг со временем затухает как 2 ** (-age / HOT_HALF_LIFE).
+    Вместо того чтобы уменьшать все оценки, каждое новое событие
+    получает вес, растущий от эпохи, — порядок получается тем же.
+    Чтобы вес не переполнял float, эпоха сдвигается, как только
+    показатель превысит HOT_REBASE_EXPONENT (см. rebase_hot_scores).
+    """
+    return weight * 2 ** ((timestamp - epoch) / HOT_HALF_LIFE)
+
+
+def bump_hot_score(post_id, category_id, weight):
+    """Прибавляет вес события к общему рейтингу и рейтингу категории.
+
+    Эпоха читается под WATCH: если её тем временем сдвинули, MULTI
+    не выполнится, и вес будет пересчитан от новой эпохи, а не
+    добавлен в старом масштабе.
+    """
+    try:
+        with REDIS.pipeline() as pipe:
+            for _ in range(HOT_BUMP_ATTEMPTS):
+                pipe.watch(HOT_EPOCH_KEY)
+                epoch = pipe.get(HOT_EPOCH_KEY)
+                now = time.time()
+                if epoch is None:
+                    pipe.unwatch()
+                    REDIS.setnx(HOT_EPOCH_KEY, now)
+                    continue
+                epoch = float(epoch)
+                if (now - epoch) / HOT_HALF_LIFE > HOT_REBASE_EXPONENT:
+                    pipe.unwatch()
+                    rebase_hot_scores(epoch, now)
+                    continue
+                increment = decayed(weight, now, epoch)
+                pipe.multi()
+                for key in (hot_key(), hot_key(category_id)):
+                    pipe.zincrby(key, increment, post_id)
+                    pipe.zremrangebyrank(key, 0, -HOT_POSTS_SIZE - 1)
+                try:
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+    except RedisError:
+        pass
+
+
+def rebase_hot_scores(epoch, now):
+    """Сдвигает эпоху к now и уменьшает все оценки в том же масштабе.
+
+    ZUNIONSTORE ключа в самого себя с весом меняет оценки на месте,
+    так что порядок публикаций не меняется. Если эпоху уже сдвинул
+    другой процесс, сдвиг не повторяется.
+    """
+    factor = 2 ** ((epoch - now) / HOT_HALF_LIFE)
+    with REDIS.pipeline() as pipe:
+        pipe.watch(HOT_EPOCH_KEY)
+        if float(pipe.get(HOT_EPOCH_KEY) or 0) != epoch:
+            return False
+        keys = [hot_key(), *pipe.scan_iter('hot:category:*')]
+        pipe.multi()
+        for key in keys:
+            pipe.zunionstore(key, {key: factor})
+        pipe.set(HOT_EPOCH_KEY, now)
+        try:
+            pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+def bump_post(post, weight):
+    if post.is_visible:
+        bump_hot_score(post.id, post.category_id, weight)
+
+
+def bump_post_by_id(post_id, weight):
+    post = (
+        Post.objects
+        .filter(id=post_id, is_visible=True)
+        .values('category_id')
+        .first()
+    )
+    if post:
+        bump_hot_score(post_id, post['category_id'], weight)
+
+
+def post_weight(post):
+    return (
+        post.total_likes * HOT_LIKE_WEIGHT
+        + post.comment_count * HOT_COMMENT_WEIGHT
+        + post.views * HOT_VIEW_WEIGHT
+    )
+
+
+def rebuild_hot_posts(since, batch_size=1000):
+    """Пересчитывает рейтинги с новой эпохой по данным из БД.
+
+    История событий не хранится, поэтому все накопленные лайки,
+    комментарии и просмотры считаются случившимися в момент публикации.
+    """
+    epoch = time.time()
+    posts = (
+        Post.objects
+        .filter(is_visible=True, pub_date__gte=since)
+        .only('id', 'category_id', 'pub_date', 'total_likes',
+              'comment_count', 'views')
+        .iterator(chunk_size=batch_size)
+    )
+    keys = {hot_key()}
+    batch = []
+    for post in posts:
+        batch.append(post)
+        if len(batch) == batch_size:
+            keys |= write_rebuild_batch(batch, epoch)
+            batch = []
+    keys |= write_rebuild_batch(batch, epoch)
+    stale_keys = set(REDIS.scan_iter('hot:category:*'))
+    pipe = REDIS.pipeline()
+    for key in keys:
+        stale_keys.discard(key.encode())
+        pipe.zremrangebyrank(f'{key}:rebuild', 0, -HOT_POSTS_SIZE - 1)
+        pipe.delete(key)
+        pipe.rename(f'{key}:rebuild', key)
+    for key in stale_keys:
+        pipe.delete(key)
+    pipe.set(HOT_EPOCH_KEY, epoch)
+    pipe.execute(raise_on_error=False)
+    return len(keys)
+
+
+def write_rebuild_batch(posts, epoch):
+    keys = set()
+    if not posts:
+        return keys
+    pipe = REDIS.pipeline(transaction=False)
+    for post in posts:
+        score = decayed(
+            post_weight(post),
+            post.pub_date.timestamp(),
+            epoch
+        )
+        for key in (hot_key(), hot_key(post.category_id)):
+            keys.add(key)
+            pipe.zincrby(f'{key}:rebuild', score, post.id)
+    pipe.execute()
+    return keys
+
+
+class HotPosts:
+    """Ленивая последовательность публикаций по убыванию рейтинга.
+
+    Подходит для стандартного Paginator: длина берётся из ZCARD,
+    срез — из ZREVRANGE и одного запроса к БД.
+    """
+
+    def __init__(self, queryset, category_id=None):
+        self.queryset = queryset
+        self.key = hot_key(category_id)
+
+    def __len__(self):
+        try:
+            return REDIS.zcard(self.key)
+        except RedisError:
+            return 0
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        try:
+            post_ids = [
+                int(post_id) for post_id in
+                REDIS.zrevrange(self.key, index.start, index.stop - 1)
+            ]
+        except RedisError:
+            return []
+        posts = self.queryset.in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+from django.conf import settings
+
+import redis
+from redis.client import Pipeline
+from redis.exceptions import RedisError, WatchError
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RedisError):
+    """Redis недавно падал, запросы временно не отправляются."""
+
+
+class PoolExhaustedError(RedisError):
+    """Все соединения пула заняты дольше REDIS_POOL_TIMEOUT.
+
+    Это не ConnectionError: Redis при этом может быть здоров,
+    поэтому предохранитель такую ошибку не считает.
+    """
+
+
+class CircuitBreaker:
+    """Размыкает цепь после threshold ошибок подряд на cooldown секунд.
+
+    Когда cooldown проходит, цепь полуразомкнута: к Redis пропускается
+    один пробный вызов, остальные по-прежнему сразу падают. Удачная
+    проба замыкает цепь, неудачная размыкает её на новый cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if (
+                self.probing
+                or time.monotonic() - self.opened_at < self.cooldown
+            ):
+                raise CircuitOpenError('Redis недоступен')
+            self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info('Redis circuit closed')
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold or self.probing:
+                if self.opened_at is None:
+                    logger.warning('Redis circuit opened')
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release_probe(self):
+        """Проба закончилась, ничего не сказав о самом Redis."""
+        with self.lock:
+            self.probing = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class LatencyMetrics:
+    """Число вызовов, ошибок и время выполнения по командам Redis."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = defaultdict(
+            lambda: {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        )
+
+    def record(self, operation, elapsed_ms, failed=False):
+        with self.lock:
+            stat = self.stats[operation]
+            stat['calls'] += 1
+            stat['errors'] += int(failed)
+            stat['total_ms'] += elapsed_ms
+            stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                operation: dict(
+                    stat,
+                    avg_ms=stat['total_ms'] / stat['calls']
+                )
+                for operation, stat in self.stats.items()
+            }
+
+
+def guarded_call(client, operation, func, *args, **kwargs):
+    client.breaker.before_call()
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except (redis.ConnectionError, redis.TimeoutError):
+        client.metrics.record(
+            operation, (time.perf_counter() - started) * 1000, failed=True
+        )
+        client.breaker.record_failure()
+        raise
+    except PoolExhaustedError:
+        client.metrics.record(
+            operation, (time.perf_counter() - started) * 1000, failed=True
+        )
+        client.breaker.release_probe()
+        raise
+    except RedisError:
+        # Ошибку вернул сам Redis, значит, он доступен.
+        client.metrics.record(
+            operation, (time.perf_counter() - started) * 1000, failed=True
+        )
+        client.breaker.record_success()
+        raise
+    except BaseException:
+        client.breaker.release_probe()
+        raise
+    client.metrics.record(operation, (time.perf_counter() - started) * 1000)
+    client.breaker.record_success()
+    return result
+
+
+class ResilientPipeline(Pipeline):
+
+    def __init__(self, client, *args, **kwargs):
+        self.client = client
+        super().__init__(*args, **kwargs)
+
+    def execute(self, raise_on_error=True):
+        return guarded_call(
+            self.client, 'PIPELINE', super().execute, raise_on_error
+        )
+
+    def immediate_execute_command(self, *args, **options):
+        # Команды после WATCH и до MULTI идут сразу, минуя execute().
+        return guarded_call(
+            self.client, str(args[0]).upper(),
+            super().immediate_execute_command, *args, **options
+        )
+
+
+class ResilientRedis(redis.Redis):
+    """Клиент Redis с предохранителем и замером времени операций.
+
+    Сетевые ошибки и таймауты размыкают цепь; пока она разомкнута,
+    вызовы сразу падают с CircuitOpenError, и вызывающий код уходит
+    в свой запасной путь, не дожидаясь таймаута.
+    """
+
+    def __init__(self, *args, breaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+        self.metrics = LatencyMetrics()
+
+    def execute_command(self, *args, **options):
+        return guarded_call(
+            self, str(args[0]).upper(), super().execute_command,
+            *args, **options
+        )
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return ResilientPipeline(
+            self, self.connection_pool, self.response_callbacks,
+            transaction, shard_hint
+        )
+
+
+@contextmanager
+def redis_lock(client, name, ttl):
+    """Блокировка SET NX с TTL; отдаёт True, если она получена.
+
+    TTL снимает блокировку упавшего процесса. Снимается она, только
+    если всё ещё принадлежит этому процессу: проверка и удаление
+    идут под WATCH, без скриптов Lua.
+    """
+    token = uuid.uuid4().hex
+    acquired = client.set(name, token, nx=True, ex=ttl)
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired:
+            release_lock(client, name, token)
+
+
+def release_lock(client, name, token):
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(name)
+            if pipe.get(name) == token.encode():
+                pipe.multi()
+                pipe.delete(name)
+                pipe.execute()
+        except WatchError:
+            pass
+
+
+class ConnectionQueue(LifoQueue):
+
+    def get(self, block=True, timeout=None):
+        try:
+            return super().get(block, timeout)
+        except Empty:
+            raise PoolExhaustedError('Все соединения с Redis заняты')
+
+
+def create_redis():
+    # Блокирующий пул: при всплеске нагрузки запрос недолго ждёт
+    # свободное соединение, а не падает с ConnectionError сразу.
+    pool = redis.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        queue_class=ConnectionQueue,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+    )
+    return ResilientRedis(
+        connection_pool=pool,
+        breaker=CircuitBreaker(
+            settings.REDIS_BREAKER_THRESHOLD,
+            settings.REDIS_BREAKER_COOLDOWN
+        )
+    )
+
+
+REDIS = create_redis()
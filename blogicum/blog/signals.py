@@ -1,16 +1,190 @@
-from django.db.models.signals import m2m_changed
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Post, Comment
+from .constants import HOT_COMMENT_WEIGHT, HOT_LIKE_WEIGHT
+from .follows import change_follow_counts
+from .images import schedule_thumbnails
+from .likes import like_kind, recount_likes
+from .media import add_reference, drop_reference
+from .models import (
+    Category, Comment, Contact, LikeShard, Post, comment_path_segment
+)
+from .ranking import bump_post, bump_post_by_id
+from .timeline import fan_out_post
 
 
 @receiver(m2m_changed, sender=Post.users_like.through)
-def post_users_like_changed(sender, instance, **kwargs):
-    instance.total_likes = instance.users_like.count()
-    instance.save()
+@receiver(m2m_changed, sender=Comment.users_like.through)
+def users_like_changed(sender, instance, action, reverse, model, pk_set,
+                       **kwargs):
+    """Счётчик лайков при работе напрямую через users_like.
 
+    Представления меняют лайки через likes.set_like и сюда не попадают.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        liked = type(instance).objects.filter(pk=instance.pk)
+    elif pk_set is not None:
+        liked = model.objects.filter(pk__in=pk_set)
+    else:
+        liked = model.objects.all()
+    recount_likes(liked)
 
-@receiver(m2m_changed, sender=Comment.users_like.through)
-def comment_users_like_changed(sender, instance, **kwargs):
-    instance.total_likes = instance.users_like.count()
-    instance.save()
+
+@receiver(post_delete, sender=Contact)
+def contact_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчики и при каскадном удалении пользователя."""
+    change_follow_counts(instance.user_from_id, instance.user_to_id, -1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def like_shards_deleted(sender, instance, **kwargs):
+    if instance.sharded_likes:
+        LikeShard.objects.filter(
+            kind=like_kind(sender), object_id=instance.pk
+        ).delete()
+
+
+@receiver(m2m_changed, sender=Post.users_like.through)
+def post_like_ranked(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        return
+    if action == 'post_add':
+        bump_post(instance, HOT_LIKE_WEIGHT * len(pk_set))
+    elif action == 'post_remove':
+        bump_post(instance, -HOT_LIKE_WEIGHT * len(pk_set))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1
+        )
+        bump_post_by_id(instance.post_id, HOT_COMMENT_WEIGHT)
+
+
+@receiver(post_save, sender=Comment)
+def comment_thread_path(sender, instance, created, **kwargs):
+    if not created:
+        return
+    instance.path = comment_path_segment(instance.id)
+    instance.depth = 0
+    if instance.parent_id:
+        parent = Comment.objects.only('path', 'depth').get(
+            pk=instance.parent_id
+        )
+        instance.path = f'{parent.path}/{instance.path}'
+        instance.depth = parent.depth + 1
+        Comment.objects.filter(pk=instance.parent_id).update(
+            replies_count=F('replies_count') + 1
+        )
+    Comment.objects.filter(pk=instance.pk).update(
+        path=instance.path, depth=instance.depth
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        Post.objects.filter(
+            pk=instance.post_id, comment_count__gt=0
+        ).update(comment_count=F('comment_count') - 1)
+    if instance.parent_id:
+        Comment.objects.filter(
+            pk=instance.parent_id, replies_count__gt=0
+        ).update(replies_count=F('replies_count') - 1)
+
+
+@receiver(pre_save, sender=Post)
+def post_visibility(sender, instance, **kwargs):
+    instance.is_visible = bool(
+        instance.is_published
+        and instance.pub_date <= timezone.now()
+        and instance.category
+        and instance.category.is_published
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_image_uploaded(sender, instance, **kwargs):
+    """Сбрасывает размеры и заглушку фото, когда загружено новое.
+
+    Файл ещё не сохранён в хранилище (_committed ложно) только
+    у только что загруженного фото, поэтому запросов к БД нет.
+    """
+    instance.image_uploaded = bool(
+        instance.image and not instance.image._committed
+    )
+    if instance.image_uploaded:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = instance.image_error = ''
+
+
+@receiver(post_save, sender=Post)
+def post_image_thumbnails(sender, instance, **kwargs):
+    if getattr(instance, 'image_uploaded', False):
+        instance.image_uploaded = False
+        transaction.on_commit(lambda: schedule_thumbnails(instance.id))
+
+
+@receiver(post_save, sender=Post)
+def post_image_referenced(sender, instance, created, **kwargs):
+    name = instance.image.name or ''
+    saved = '' if created else getattr(instance, 'saved_image', None)
+    if saved is None or saved == name:
+        return
+    add_reference(name)
+    drop_reference(saved)
+    instance.saved_image = name
+
+
+@receiver(post_delete, sender=Post)
+def post_image_released(sender, instance, **kwargs):
+    drop_reference(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_became_visible(sender, instance, created, update_fields=None,
+                        **kwargs):
+    """Рассылает публикацию в ленты, когда она стала видимой.
+
+    Правки уже видимой публикации и сохранения отдельных полей
+    без is_visible ленты не трогают.
+    """
+    if update_fields is not None and 'is_visible' not in update_fields:
+        return
+    saved = False if created else getattr(instance, 'saved_visible', False)
+    instance.saved_visible = instance.is_visible
+    if instance.is_visible and not saved:
+        transaction.on_commit(lambda: fan_out_post(instance))
+
+
+@receiver(post_save, sender=Category)
+def category_visibility_changed(sender, instance, **kwargs):
+    if instance.is_published:
+        revealed = list(instance.posts.filter(
+            is_visible=False,
+            is_published=True,
+            pub_date__lte=timezone.now()
+        ).only('id', 'author_id', 'pub_date'))
+        Post.objects.filter(
+            pk__in=[post.pk for post in revealed]
+        ).update(is_visible=True)
+        for post in revealed:
+            post.is_visible = True
+            transaction.on_commit(lambda post=post: fan_out_post(post))
+    else:
+        instance.posts.filter(is_visible=True).update(is_visible=False)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    instance.posts.filter(is_visible=True).update(is_visible=False)
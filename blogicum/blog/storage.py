@@ -0,0 +1,421 @@
+import hashlib
+import hmac
+import http.client
+import mimetypes
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+from django.utils.timezone import make_naive
+
+from .constants import S3_MULTIPART_THRESHOLD, S3_PART_SIZE
+
+
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+# Соединение, сброшенное сервером между запросами keep-alive.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError
+)
+
+
+class S3Error(Exception):
+
+    def __init__(self, status, body=b''):
+        self.status = status
+        self.code = None
+        try:
+            self.code = ElementTree.fromstring(body).findtext('Code')
+        except ElementTree.ParseError:
+            pass
+        super().__init__(f'S3 {status}: {self.code or body[:200]!r}')
+
+
+def encode_path(path):
+    return quote(path, safe='/~')
+
+
+def canonical_query(params):
+    return '&'.join(
+        f"{quote(key, safe='~')}={quote(str(value), safe='~')}"
+        for key, value in sorted(params.items())
+    )
+
+
+def signing_key(secret_key, date, region):
+    key = ('AWS4' + secret_key).encode()
+    for part in (date, region, 's3', 'aws4_request'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return key
+
+
+def signature_v4(secret_key, region, amz_date, method, path, params,
+                 headers, payload_hash):
+    """Подпись запроса AWS Signature Version 4.
+
+    headers — заголовки, входящие в подпись, с именами в нижнем
+    регистре; вместе с params они должны совпасть с отправленными.
+    """
+    signed_headers = ';'.join(sorted(headers))
+    canonical_request = '\n'.join([
+        method,
+        encode_path(path),
+        canonical_query(params),
+        ''.join(
+            f'{name}:{str(headers[name]).strip()}\n'
+            for name in sorted(headers)
+        ),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = f'{amz_date[:8]}/{region}/s3/aws4_request'
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256',
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    signature = hmac.new(
+        signing_key(secret_key, amz_date[:8], region),
+        string_to_sign.encode(),
+        hashlib.sha256
+    ).hexdigest()
+    return scope, signed_headers, signature
+
+
+class S3Client:
+    """Минимальный клиент S3-совместимого API поверх http.client.
+
+    Подходит для AWS S3, MinIO, Ceph и других хранилищ с подписью V4.
+    Адреса в стиле path: <endpoint>/<bucket>/<ключ>. Тело запросов
+    не хэшируется (UNSIGNED-PAYLOAD), поэтому загрузки идут потоком,
+    без второго чтения файла. Соединения keep-alive держатся по одному
+    на поток.
+    """
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key,
+                 region='us-east-1'):
+        endpoint = urlsplit(endpoint_url)
+        self.secure = endpoint.scheme == 'https'
+        self.host = endpoint.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.local = threading.local()
+
+    def object_path(self, key=''):
+        return f'/{self.bucket}/{key}' if key else f'/{self.bucket}'
+
+    def connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.secure
+            else http.client.HTTPConnection
+        )
+        return connection_class(self.host, timeout=settings.S3_TIMEOUT)
+
+    def signed_headers(self, method, path, params, headers=None):
+        amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+        headers = {
+            'host': self.host,
+            'x-amz-content-sha256': UNSIGNED_PAYLOAD,
+            'x-amz-date': amz_date,
+            **{name.lower(): value for name, value in (headers or {}).items()}
+        }
+        scope, signed, signature = signature_v4(
+            self.secret_key, self.region, amz_date, method, path, params,
+            headers, UNSIGNED_PAYLOAD
+        )
+        headers['authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+            f'SignedHeaders={signed}, Signature={signature}'
+        )
+        return headers
+
+    def request(self, method, key='', params=None, headers=None, body=None,
+                connection=None):
+        """Выполняет запрос и возвращает ответ; для ошибок — S3Error.
+
+        Без connection запрос идёт по соединению потока, и ответ нужно
+        дочитать до следующего запроса. Ответы, которые читаются
+        потоком, получают своё соединение.
+        """
+        params = params or {}
+        path = self.object_path(key)
+        url = encode_path(path)
+        if params:
+            url += '?' + canonical_query(params)
+        headers = self.signed_headers(method, path, params, headers)
+        if connection is not None:
+            connection.request(
+                method, url, body=request_body(body), headers=headers
+            )
+            response = connection.getresponse()
+        else:
+            response = self.send(method, url, body, headers)
+        if response.status >= 300:
+            error = S3Error(
+                response.status, b'' if method == 'HEAD' else response.read()
+            )
+            response.close()
+            raise error
+        return response
+
+    def send(self, method, url, body, headers):
+        connection = getattr(self.local, 'connection', None)
+        # Повторить запрос на свежем соединении можно, только если
+        # тело читается заново: байты или функция, отдающая новый
+        # итератор частей. Поток, прочитанный наполовину, не повторить.
+        retry = connection is not None and (
+            body is None or isinstance(body, bytes) or callable(body)
+        )
+        if connection is None:
+            connection = self.local.connection = self.connect()
+        try:
+            connection.request(
+                method, url, body=request_body(body), headers=headers
+            )
+            return connection.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            connection.close()
+            self.local.connection = None
+            if not retry:
+                raise
+            return self.send(method, url, body, headers)
+
+    def call(self, method, key='', **kwargs):
+        response = self.request(method, key, **kwargs)
+        body = response.read()
+        return response, body
+
+    def head_object(self, key):
+        try:
+            response, _ = self.call('HEAD', key)
+        except S3Error as error:
+            if error.status == 404:
+                return None
+            raise
+        return response
+
+    def put_object(self, key, chunks, length, content_type):
+        """Загружает объект одним запросом.
+
+        chunks — функция без аргументов, которая каждый раз отдаёт
+        части тела с начала: так запрос повторяется, если сервер
+        закрыл соединение keep-alive.
+        """
+        response, _ = self.call(
+            'PUT', key, body=chunks,
+            headers={'Content-Length': length, 'Content-Type': content_type}
+        )
+        return response.getheader('ETag')
+
+    def upload_multipart(self, key, chunks, content_type):
+        """Загружает файл частями по S3_PART_SIZE байт.
+
+        В памяти держится одна часть; при ошибке незавершённая
+        загрузка отменяется, чтобы части не занимали место в бакете.
+        """
+        _, body = self.call(
+            'POST', key, params={'uploads': ''},
+            headers={'Content-Type': content_type}
+        )
+        upload_id = ElementTree.fromstring(body).findtext(
+            f'{S3_NAMESPACE}UploadId'
+        )
+        try:
+            parts = []
+            for number, part in enumerate(parts_of(chunks), start=1):
+                response, _ = self.call(
+                    'PUT', key,
+                    params={'partNumber': number, 'uploadId': upload_id},
+                    headers={'Content-Length': len(part)},
+                    body=part
+                )
+                parts.append((number, response.getheader('ETag')))
+            manifest = ''.join(
+                f'<Part><PartNumber>{number}</PartNumber>'
+                f'<ETag>{etag}</ETag></Part>'
+                for number, etag in parts
+            )
+            _, body = self.call(
+                'POST', key, params={'uploadId': upload_id},
+                body=(
+                    '<CompleteMultipartUpload>'
+                    f'{manifest}</CompleteMultipartUpload>'
+                ).encode()
+            )
+            # Ошибка сборки частей приходит с кодом 200 в теле ответа.
+            if ElementTree.fromstring(body).tag == 'Error':
+                raise S3Error(200, body)
+        except BaseException:
+            self.call('DELETE', key, params={'uploadId': upload_id})
+            raise
+
+    def list_objects(self, prefix, delimiter='/'):
+        """Ключи и общие префиксы под prefix, страница за страницей."""
+        params = {'list-type': 2, 'prefix': prefix, 'delimiter': delimiter}
+        while True:
+            _, body = self.call('GET', params=params)
+            root = ElementTree.fromstring(body)
+            yield (
+                [
+                    item.findtext(f'{S3_NAMESPACE}Prefix')
+                    for item in root.iter(f'{S3_NAMESPACE}CommonPrefixes')
+                ],
+                [
+                    item.findtext(f'{S3_NAMESPACE}Key')
+                    for item in root.iter(f'{S3_NAMESPACE}Contents')
+                ],
+            )
+            token = root.findtext(f'{S3_NAMESPACE}NextContinuationToken')
+            if not token:
+                return
+            params['continuation-token'] = token
+
+    def presigned_url(self, base_url, key, expires, signed_at):
+        """Подписанная ссылка на GET объекта, действующая expires секунд."""
+        amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(signed_at))
+        host = urlsplit(base_url).netloc
+        path = self.object_path(key)
+        params = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': (
+                f'{self.access_key}/{amz_date[:8]}/{self.region}'
+                '/s3/aws4_request'
+            ),
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': expires,
+            'X-Amz-SignedHeaders': 'host',
+        }
+        _, _, signature = signature_v4(
+            self.secret_key, self.region, amz_date, 'GET', path, params,
+            {'host': host}, UNSIGNED_PAYLOAD
+        )
+        params['X-Amz-Signature'] = signature
+        return (
+            f'{base_url}{encode_path(path)}?{canonical_query(params)}'
+        )
+
+
+def request_body(body):
+    return body() if callable(body) else body
+
+
+def parts_of(chunks, size=S3_PART_SIZE):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class S3File(File):
+    """Объект из бакета, читаемый потоком прямо из ответа HTTP."""
+
+    def __init__(self, response, name, connection):
+        super().__init__(response, name)
+        self.size = int(response.getheader('Content-Length', 0))
+        self.connection = connection
+
+    def close(self):
+        self.file.close()
+        self.connection.close()
+
+
+@deconstructible
+class S3Storage(Storage):
+    """Хранилище медиафайлов в бакете S3-совместимого сервиса.
+
+    Все узлы приложения видят одни и те же файлы. Локально его
+    можно проверить на MinIO: настройки S3_* в settings.py.
+    Ссылки на файлы подписываются (MEDIA_SIGNED_URLS) или ведут
+    на S3_PUBLIC_URL — публичный адрес бакета или CDN перед ним. Файлы с тем же
+    именем перезаписываются: имена фото — хэши содержимого.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or S3Client(
+            settings.S3_ENDPOINT_URL,
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY,
+            settings.S3_SECRET_KEY,
+            settings.S3_REGION,
+        )
+
+    def _open(self, name, mode='rb'):
+        connection = self.client.connect()
+        try:
+            response = self.client.request('GET', name, connection=connection)
+        except BaseException:
+            connection.close()
+            raise
+        return S3File(response, name, connection)
+
+    def _save(self, name, content):
+        content_type = (
+            getattr(content, 'content_type', None)
+            or mimetypes.guess_type(name)[0]
+            or 'application/octet-stream'
+        )
+        if content.size > S3_MULTIPART_THRESHOLD:
+            self.client.upload_multipart(
+                name, content.chunks(), content_type
+            )
+        else:
+            self.client.put_object(
+                name, content.chunks, content.size, content_type
+            )
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def delete(self, name):
+        self.client.call('DELETE', name)
+
+    def exists(self, name):
+        return self.client.head_object(name) is not None
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = [], []
+        for page_directories, page_files in self.client.list_objects(prefix):
+            directories += [
+                directory[len(prefix):].rstrip('/')
+                for directory in page_directories
+            ]
+            files += [key[len(prefix):] for key in page_files]
+        return directories, files
+
+    def size(self, name):
+        return int(self.client.head_object(name).getheader('Content-Length'))
+
+    def get_modified_time(self, name):
+        modified = parsedate_to_datetime(
+            self.client.head_object(name).getheader('Last-Modified')
+        )
+        return modified if settings.USE_TZ else make_naive(modified)
+
+    def url(self, name):
+        if not settings.MEDIA_SIGNED_URLS:
+            return f'{settings.S3_PUBLIC_URL}/{encode_path(name)}'
+        # Время подписи округляется вниз, чтобы ссылка не менялась
+        # от запроса к запросу и браузер брал фото из кэша.
+        expires = settings.MEDIA_URL_EXPIRES
+        step = max(expires // 2, 1)
+        now = int(time.time())
+        return self.client.presigned_url(
+            settings.S3_ENDPOINT_URL, name, expires, now - now % step
+        )
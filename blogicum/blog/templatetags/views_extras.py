@@ -1,5 +1,7 @@
 from django import template
 
+from blog.images import image_srcset
+
 
 register = template.Library()
 
@@ -18,3 +20,8 @@ def ru_plural(value, variants):
         variant = 2
 
     return variants[variant]
+
+
+@register.filter
+def srcset(post):
+    return image_srcset(post)
@@ -0,0 +1,133 @@
+from django.db.models import Q
+
+from redis.exceptions import RedisError
+
+from .constants import FANOUT_MAX_FOLLOWERS, TIMELINE_SIZE
+from .models import Contact, FollowStats, Post, User
+from .redis_client import REDIS
+
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def timeline_key(user_id):
+    return f'timeline:{user_id}'
+
+
+def is_fanout_author(author_id):
+    return not FollowStats.objects.filter(
+        user_id=author_id, followers_count__gt=FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def fan_out_post(post):
+    """Кладёт видимую публикацию в ленты подписчиков автора.
+
+    Для авторов с большим числом подписчиков ничего не пишет:
+    их публикации подмешиваются при чтении ленты.
+    """
+    if not post.is_visible or not is_fanout_author(post.author_id):
+        return
+    follower_ids = (
+        Contact.objects
+        .filter(user_to_id=post.author_id)
+        .values_list('user_from_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    score = post.pub_date.timestamp()
+    try:
+        pipe = REDIS.pipeline(transaction=False)
+        for count, follower_id in enumerate(follower_ids, 1):
+            key = timeline_key(follower_id)
+            pipe.zadd(key, {post.id: score})
+            pipe.zremrangebyrank(key, 0, -TIMELINE_SIZE - 1)
+            if count % FANOUT_BATCH_SIZE == 0:
+                pipe.execute()
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def backfill_timeline(user_id, author_id):
+    if not is_fanout_author(author_id):
+        return
+    posts = (
+        Post.objects
+        .filter(author_id=author_id, is_visible=True)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:TIMELINE_SIZE]
+    )
+    entries = {post_id: pub_date.timestamp() for post_id, pub_date in posts}
+    if not entries:
+        return
+    key = timeline_key(user_id)
+    try:
+        pipe = REDIS.pipeline()
+        pipe.zadd(key, entries)
+        pipe.zremrangebyrank(key, 0, -TIMELINE_SIZE - 1)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def trim_timeline(user_id, author_id):
+    post_ids = list(
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', flat=True)[:TIMELINE_SIZE]
+    )
+    if not post_ids:
+        return
+    try:
+        REDIS.zrem(timeline_key(user_id), *post_ids)
+    except RedisError:
+        pass
+
+
+def rebuild_timeline(user_id):
+    """Собирает ленту пользователя в Redis заново из БД.
+
+    Нужна, когда ключа нет: после потери данных Redis или у ленты,
+    в которую ещё ничего не рассылалось. Возвращает id публикаций.
+    """
+    posts = (
+        Post.objects
+        .filter(is_visible=True, author__rel_to_set__user_from_id=user_id)
+        .exclude(
+            author__follow_stats__followers_count__gt=FANOUT_MAX_FOLLOWERS
+        )
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:TIMELINE_SIZE]
+    )
+    entries = {post_id: pub_date.timestamp() for post_id, pub_date in posts}
+    if entries:
+        try:
+            REDIS.zadd(timeline_key(user_id), entries)
+        except RedisError:
+            pass
+    return list(entries)
+
+
+def following_posts_filter(user):
+    """Условие для ленты подписок пользователя.
+
+    Публикации обычных авторов берутся из Redis, публикации авторов
+    с большим числом подписчиков — напрямую из БД. Если Redis
+    недоступен, вся лента собирается из БД; если ключа ленты нет,
+    она пересобирается.
+    """
+    following = User.objects.filter(rel_to_set__user_from=user)
+    try:
+        post_ids = [
+            int(post_id)
+            for post_id in REDIS.zrange(timeline_key(user.id), 0, -1)
+        ]
+        if not post_ids:
+            post_ids = rebuild_timeline(user.id)
+    except RedisError:
+        return Q(author__in=following)
+    merged_authors = following.filter(
+        follow_stats__followers_count__gt=FANOUT_MAX_FOLLOWERS
+    )
+    return Q(id__in=post_ids) | Q(author__in=merged_authors)
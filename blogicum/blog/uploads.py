@@ -0,0 +1,207 @@
+import logging
+import posixpath
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import get_available_image_extensions
+from django.db import connection, transaction
+from django.utils import timezone
+
+from PIL import Image
+
+from .constants import (
+    UPLOAD_ATTACH_DELAY, UPLOAD_EXPIRY, UPLOAD_MAX_SIZE, UPLOAD_READ_SIZE
+)
+from .images import (
+    generate_post_thumbnails, log_failure, record_image_error, thumbnail_pool
+)
+from .media import add_reference, drop_reference
+from .models import ImageUpload, Post
+
+
+logger = logging.getLogger(__name__)
+
+
+class UploadOffsetError(Exception):
+    """Часть прислана не с того места, где остановилась загрузка."""
+
+    def __init__(self, received):
+        self.received = received
+        super().__init__(f'Ожидалось смещение {received}')
+
+
+def upload_path(token):
+    return Path(settings.UPLOADS_DIR) / f'{token}.part'
+
+
+def start_upload(user, filename, size):
+    extension = posixpath.splitext(filename)[1].lstrip('.').lower()
+    if extension not in get_available_image_extensions():
+        raise ValidationError('Неподдерживаемый формат фото')
+    if not 0 < size <= UPLOAD_MAX_SIZE:
+        raise ValidationError('Недопустимый размер файла')
+    upload = ImageUpload.objects.create(
+        user=user, filename=posixpath.basename(filename), size=size
+    )
+    path = upload_path(upload.token)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """Дописывает часть из stream и возвращает, сколько байт получено.
+
+    Тело запроса читается кусками по UPLOAD_READ_SIZE, поэтому память
+    не зависит от размера части. Если прошлая часть оборвалась,
+    недописанный хвост файла обрезается, и загрузка продолжается
+    с received. Строка загрузки заблокирована на время записи:
+    повторы одной части, пришедшие параллельно, пишут файл по очереди,
+    и все, кроме первого, получают UploadOffsetError.
+    """
+    if length < 0 or offset + length > upload.size:
+        raise ValidationError('Часть выходит за размер файла')
+    with transaction.atomic():
+        locked = (
+            ImageUpload.objects
+            .select_for_update()
+            .filter(token=upload.token)
+            .first()
+        )
+        if locked is None:
+            raise ValidationError('Загрузка не найдена')
+        if offset != locked.received:
+            upload.received = locked.received
+            raise UploadOffsetError(locked.received)
+        with open(upload_path(upload.token), 'r+b') as file:
+            file.seek(offset)
+            remaining = length
+            while remaining:
+                data = stream.read(min(UPLOAD_READ_SIZE, remaining))
+                if not data:
+                    break
+                file.write(data)
+                remaining -= len(data)
+            file.truncate()
+        received = offset + length - remaining
+        ImageUpload.objects.filter(token=upload.token).update(
+            received=received, updated_at=timezone.now()
+        )
+    upload.received = received
+    return received
+
+
+def has_image_header(upload):
+    """Быстрая проверка, что загружен файл фото, до приёма формы.
+
+    Pillow читает только заголовок; полная проверка (verify)
+    идёт в attach_upload.
+    """
+    try:
+        with Image.open(upload_path(upload.token)):
+            return True
+    except (OSError, SyntaxError, ValueError):
+        return False
+
+
+def discard_upload(upload):
+    upload_path(upload.token).unlink(missing_ok=True)
+    upload.delete()
+
+
+def attach_upload(post_id, token):
+    """Проверяет загруженное фото и делает его фото публикации.
+
+    Работает в фоновом пуле: проверка Pillow, сохранение под хэшем
+    содержимого и миниатюры не задерживают отправку формы. Фото
+    ставится, только если фото публикации не сменили за это время;
+    ссылки MediaFile меняются, только когда строка обновлена.
+    Битое фото отмечается в image_error публикации.
+    """
+    upload = ImageUpload.objects.filter(token=token).first()
+    if upload is None or not upload.is_complete:
+        return False
+    path = upload_path(token)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, ValueError) as error:
+        logger.warning('Upload %s is not a valid image', token)
+        record_image_error(post_id, error)
+        discard_upload(upload)
+        return False
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        discard_upload(upload)
+        return False
+    old_name = post.image.name
+    with open(path, 'rb') as file:
+        post.image.save(upload.filename, File(file), save=False)
+    with transaction.atomic():
+        updated = Post.objects.filter(pk=post_id, image=old_name).update(
+            image=post.image.name,
+            image_width=None,
+            image_height=None,
+            image_placeholder='',
+            image_error=''
+        )
+        if updated and post.image.name != old_name:
+            add_reference(post.image.name)
+            drop_reference(old_name)
+    discard_upload(upload)
+    if not updated:
+        return False
+    generate_post_thumbnails(post_id)
+    return True
+
+
+def attach_job(post_id, token):
+    try:
+        return attach_upload(post_id, token)
+    except Exception as error:
+        record_image_error(post_id, error)
+        raise
+    finally:
+        connection.close()
+
+
+def schedule_attach(post_id, token):
+    future = thumbnail_pool.submit(attach_job, post_id, token)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def attach_pending_uploads(delay=UPLOAD_ATTACH_DELAY):
+    """Повторяет привязку фото, которую фоновый пул не довёл до конца.
+
+    Задание пула живёт в памяти процесса, а ImageUpload.post — в БД:
+    загрузки принятых форм, лежащие дольше delay секунд, привязываются
+    здесь. Возвращает число привязанных фото.
+    """
+    pending = ImageUpload.objects.filter(
+        post__isnull=False,
+        updated_at__lt=timezone.now() - timedelta(seconds=delay)
+    ).values_list('post_id', 'token')
+    attached = 0
+    for post_id, token in list(pending):
+        try:
+            attached += attach_upload(post_id, token)
+        except Exception as error:
+            logger.exception('Attaching upload %s failed', token)
+            record_image_error(post_id, error)
+    return attached
+
+
+def clean_uploads(expiry=UPLOAD_EXPIRY):
+    """Удаляет загрузки, которые не менялись дольше expiry секунд."""
+    stale = ImageUpload.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=expiry)
+    )
+    removed = 0
+    for upload in list(stale):
+        discard_upload(upload)
+        removed += 1
+    return removed
@@ -27,6 +27,32 @@ urlpatterns = [
         views.CategoryPostsView.as_view(),
         name='category_posts'
     ),
+    path(
+        'popular/',
+        views.PopularPostsView.as_view(),
+        name='popular'
+    ),
+    path(
+        'popular/<slug:category_slug>/',
+        views.PopularPostsView.as_view(),
+        name='popular_category'
+    ),
+    path(
+        'trending/',
+        views.TrendingPostsView.as_view(),
+        name='trending'
+    ),
+    path(
+        'trending/all/',
+        views.TrendingPostsView.as_view(),
+        {'all_time': True},
+        name='trending_all'
+    ),
+    path(
+        'feed/following/',
+        views.FollowingFeedView.as_view(),
+        name='following_feed'
+    ),
     path(
         'profile/follow/',
         views.user_follow,
@@ -42,6 +68,16 @@ urlpatterns = [
         views.PostCreateView.as_view(),
         name='create_post'
     ),
+    path(
+        'posts/uploads/',
+        views.image_upload,
+        name='image_upload'
+    ),
+    path(
+        'posts/uploads/<uuid:token>/',
+        views.image_upload_chunk,
+        name='image_upload_chunk'
+    ),
     path(
         'accounts/profile/',
         views.EditProfileView.as_view(),
@@ -52,6 +88,16 @@ urlpatterns = [
         views.AddCommentView.as_view(),
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/replies/',
+        views.comment_replies,
+        name='comment_replies'
+    ),
     path(
         'posts/<int:post_id>/edit_comment/<comment_id>/',
         views.EditCommentView.as_view(),
@@ -67,9 +113,19 @@ urlpatterns = [
         views.PostLike.as_view(),
         name='like'
     ),
+    path(
+        'posts/like/batch/',
+        views.like_batch,
+        name='like_batch'
+    ),
     path(
         'posts/like_comment/',
         views.comment_like,
         name='comment_like'
+    ),
+    path(
+        'metrics/redis/',
+        views.redis_metrics,
+        name='redis_metrics'
     )
 ]
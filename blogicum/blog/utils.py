@@ -1,22 +1,22 @@
-from django.db.models.functions import Now
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
 
-from .models import User
+from .constants import (
+    COMMENT_INLINE_DEPTH, COMMENT_INLINE_REPLIES, COMMENT_REPLIES_PER_PAGE,
+    COMMENTS_PER_PAGE
+)
+from .models import Comment, Post, User
+from .pagination import KeysetPaginator
 
 
 def posts_queryset(objects_manager):
     return (
         objects_manager
-        .filter(
-            is_published=True,
-            pub_date__lte=Now(),
-            category__is_published=True
-        )
+        .filter(is_visible=True)
         .select_related('author')
         .prefetch_related('category', 'location')
         .order_by('-pub_date')
-        .annotate(comment_count=Count('comments'))
     )
 
 
@@ -26,9 +26,151 @@ def get_user_posts(objects_manager):
         .select_related('author')
         .prefetch_related('category', 'location')
         .order_by('-pub_date')
-        .annotate(comment_count=Count('comments'))
     )
 
 
 def get_user(username):
     return get_object_or_404(User, username=username)
+
+
+def get_post_detail(post_id):
+    return get_object_or_404(
+        Post.objects.select_related('author', 'category', 'location'),
+        id=post_id
+    )
+
+
+def get_post_comments(post, cursor=None):
+    paginator = KeysetPaginator(
+        post.comments
+        .filter(depth=0)
+        .select_related('author')
+        .annotate(inline_until=inline_replies_bound()),
+        COMMENTS_PER_PAGE,
+        field='created_at',
+        descending=False
+    )
+    return paginator.page(cursor=cursor)
+
+
+def inline_replies_bound():
+    """Путь (path) первого ответа корня, который уже не показывается сразу.
+
+    Коррелированный подзапрос идёт по индексу (post, path) и читает
+    не больше COMMENT_INLINE_REPLIES + 1 строк на корень. NULL —
+    ответов не больше лимита, показываются все.
+    """
+    return Subquery(
+        Comment.objects
+        .filter(
+            post_id=OuterRef('post_id'),
+            path__gt=Concat(OuterRef('path'), Value('/')),
+            path__lt=Concat(OuterRef('path'), Value('0')),
+            depth__lte=COMMENT_INLINE_DEPTH
+        )
+        .order_by('path')
+        .values('path')[COMMENT_INLINE_REPLIES:COMMENT_INLINE_REPLIES + 1]
+    )
+
+
+def subtree(path):
+    """Условие на всех потомков комментария с этим path.
+
+    Сегменты пути — base36, а «/» меньше «0», поэтому потомки лежат
+    строго между path + '/' и path + '0'.
+    """
+    return Q(path__gt=path + '/', path__lt=path + '0')
+
+
+def mark_more_replies(comment, parent):
+    """Ставит после comment кнопку, догружающую остальные ответы parent."""
+    comment.more_replies_parent = parent.id
+    comment.more_replies_after = comment.path
+
+
+def get_comment_thread(post, roots):
+    """Корневые комментарии страницы вместе с первыми ответами.
+
+    У каждого корня сразу показываются первые COMMENT_INLINE_REPLIES
+    ответов до глубины COMMENT_INLINE_DEPTH — всё одним запросом
+    по диапазонам path. Остальные ответы и более глубокие ветки
+    догружаются по кнопке через get_comment_replies.
+    """
+    roots = list(roots)
+    if not roots:
+        return []
+    ranges = Q()
+    for root in roots:
+        bound = subtree(root.path)
+        if root.inline_until:
+            bound &= Q(path__lt=root.inline_until)
+        ranges |= bound
+    replies = {root.path: [] for root in roots}
+    for reply in (
+        post.comments
+        .filter(ranges, depth__range=(1, COMMENT_INLINE_DEPTH))
+        .select_related('author')
+        .order_by('path')
+    ):
+        root_path = reply.path.split('/', 1)[0]
+        if root_path in replies:
+            replies[root_path].append(reply)
+    thread = []
+    for root in roots:
+        thread.append(root)
+        thread.extend(replies[root.path])
+        if root.inline_until and replies[root.path]:
+            mark_more_replies(replies[root.path][-1], root)
+    return thread
+
+
+def get_comment_replies(comment, after=None):
+    """Страница ответов на комментарий до COMMENT_INLINE_DEPTH вглубь.
+
+    after — path последнего уже показанного ответа. Если ответов
+    больше COMMENT_REPLIES_PER_PAGE, за последним ставится кнопка
+    следующей страницы.
+    """
+    replies = (
+        Comment.objects
+        .filter(
+            subtree(comment.path),
+            post_id=comment.post_id,
+            depth__lte=comment.depth + COMMENT_INLINE_DEPTH
+        )
+        .select_related('author')
+        .order_by('path')
+    )
+    if after:
+        replies = replies.filter(path__gt=after)
+    replies = list(replies[:COMMENT_REPLIES_PER_PAGE + 1])
+    if len(replies) > COMMENT_REPLIES_PER_PAGE:
+        replies = replies[:COMMENT_REPLIES_PER_PAGE]
+        mark_more_replies(replies[-1], comment)
+    return replies
+
+
+def get_liked_post_ids(user, posts):
+    if not user.is_authenticated or not posts:
+        return set()
+    return set(
+        Post.users_like.through.objects
+        .filter(user=user, post__in=[post.id for post in posts])
+        .values_list('post_id', flat=True)
+    )
+
+
+def get_liked_comment_ids(user, comments):
+    if not user.is_authenticated or not comments:
+        return set()
+    return set(
+        Comment.users_like.through.objects
+        .filter(user=user, comment__in=[comment.id for comment in comments])
+        .values_list('comment_id', flat=True)
+    )
+
+
+def is_post_available(post, user):
+    return post.author == user or (
+        post.is_published and post.category.is_published
+    )
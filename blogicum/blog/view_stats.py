@@ -0,0 +1,280 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from redis.exceptions import RedisError, WatchError
+
+from .constants import (
+    CMS_DEPTH, CMS_WIDTH, TOP_K, TRENDING_HOURS, UNIQUE_VIEWERS_TTL,
+    VIEWS_FLUSH_BATCH_SIZE, VIEWS_FLUSH_LOCK_TTL, VIEWS_FLUSH_LOG_TTL
+)
+from .models import Post, ViewFlush
+from .redis_client import REDIS, redis_lock
+
+
+HOUR = 60 * 60
+TRENDING_CACHE_TTL = 60
+PENDING_VIEWS_KEY = 'views:pending'
+FLUSHING_VIEWS_KEY = 'views:flushing'
+FLUSH_ID_KEY = 'views:flushing:id'
+FLUSH_LOCK_KEY = 'views:flush:lock'
+
+local_pending_views = Counter()
+local_pending_lock = threading.Lock()
+
+
+def viewer_id(request):
+    """Идентификатор зрителя для HyperLogLog.
+
+    Для анонимов без сессии сессию не создаём, а берём хэш адреса
+    и User-Agent, чтобы не писать в БД на каждый просмотр.
+    """
+    if request.user.is_authenticated:
+        return f'u:{request.user.id}'
+    if request.session.session_key:
+        return f's:{request.session.session_key}'
+    fingerprint = '{}|{}'.format(
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', '')
+    )
+    return 'a:' + hashlib.blake2b(
+        fingerprint.encode(), digest_size=8
+    ).hexdigest()
+
+
+def sketch_offsets(post_id):
+    digest = hashlib.blake2b(
+        str(post_id).encode(), digest_size=4 * CMS_DEPTH
+    ).digest()
+    return [
+        row * CMS_WIDTH
+        + int.from_bytes(digest[row * 4:row * 4 + 4], 'big') % CMS_WIDTH
+        for row in range(CMS_DEPTH)
+    ]
+
+
+def add_to_sketch(pipe, bucket, post_id, ttl=None):
+    """Count-Min sketch плюс top-K кандидатов для одного окна.
+
+    Скетч — строка из CMS_DEPTH * CMS_WIDTH счётчиков u32, поэтому его
+    размер не зависит от числа публикаций; top-K обрезается до TOP_K.
+    """
+    sketch_key = f'views:cms:{bucket}'
+    operation = pipe.bitfield(sketch_key, default_overflow='SAT')
+    for offset in sketch_offsets(post_id):
+        operation.incrby('u32', f'#{offset}', 1)
+    operation.execute()
+    if ttl:
+        pipe.expire(sketch_key, ttl)
+
+
+def update_top_k(bucket, post_id, estimate, ttl=None):
+    key = f'views:topk:{bucket}'
+    pipe = REDIS.pipeline(transaction=False)
+    pipe.zadd(key, {post_id: estimate})
+    pipe.zremrangebyrank(key, 0, -TOP_K - 1)
+    if ttl:
+        pipe.expire(key, ttl)
+    pipe.execute()
+
+
+def record_view(post_id, viewer):
+    """Учитывает просмотр и возвращает число уникальных зрителей.
+
+    В скетч и top-K попадают только новые зрители — те, на ком PFADD
+    вернул 1, поэтому обновление страницы одним человеком не выводит
+    публикацию в тренды. HyperLogLog изредка принимает нового зрителя
+    за старого, так что тренды слегка занижены, но не завышены.
+    """
+    hour = int(time.time()) // HOUR
+    hourly_ttl = (TRENDING_HOURS + 1) * HOUR
+    viewers_key = f'post:{post_id}:viewers'
+    try:
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.pfadd(viewers_key, viewer)
+        pipe.expire(viewers_key, UNIQUE_VIEWERS_TTL)
+        pipe.pfcount(viewers_key)
+        is_new_viewer, _, viewers = pipe.execute()
+        if not is_new_viewer:
+            return viewers
+        pipe = REDIS.pipeline(transaction=False)
+        add_to_sketch(pipe, hour, post_id, ttl=hourly_ttl)
+        add_to_sketch(pipe, 'all', post_id)
+        results = pipe.execute()
+    except RedisError:
+        return None
+    hourly_estimate = min(results[0])
+    total_estimate = min(results[-1])
+    try:
+        update_top_k(hour, post_id, hourly_estimate, ttl=hourly_ttl)
+        update_top_k('all', post_id, total_estimate)
+    except RedisError:
+        pass
+    return viewers
+
+
+def unique_viewers(post_id):
+    try:
+        return REDIS.pfcount(f'post:{post_id}:viewers')
+    except RedisError:
+        return None
+
+
+def trending_post_ids(hours=TRENDING_HOURS):
+    """Публикации с наибольшим числом просмотров за последние часы.
+
+    Складывает почасовые top-K и кэширует результат на минуту.
+    """
+    key = f'views:trending:{hours}'
+    try:
+        if not REDIS.exists(key):
+            hour = int(time.time()) // HOUR
+            pipe = REDIS.pipeline()
+            pipe.zunionstore(
+                key,
+                [f'views:topk:{hour - ago}' for ago in range(hours)]
+            )
+            pipe.zremrangebyrank(key, 0, -TOP_K - 1)
+            pipe.expire(key, TRENDING_CACHE_TTL)
+            pipe.execute()
+        return [int(post_id) for post_id in REDIS.zrevrange(key, 0, -1)]
+    except RedisError:
+        return []
+
+
+def heaviest_post_ids():
+    try:
+        return [
+            int(post_id)
+            for post_id in REDIS.zrevrange('views:topk:all', 0, -1)
+        ]
+    except RedisError:
+        return []
+
+
+def buffer_view(post_id):
+    """Копит просмотр в Redis и возвращает ещё не сохранённую дельту.
+
+    Пока Redis недоступен, просмотры копятся в памяти процесса и
+    переносятся в Redis при первом удачном обращении.
+    """
+    try:
+        drain_local_views()
+        return REDIS.hincrby(PENDING_VIEWS_KEY, post_id, 1)
+    except RedisError:
+        with local_pending_lock:
+            local_pending_views[post_id] += 1
+            return local_pending_views[post_id]
+
+
+def drain_local_views():
+    with local_pending_lock:
+        if not local_pending_views:
+            return
+        deltas = dict(local_pending_views)
+        local_pending_views.clear()
+    try:
+        pipe = REDIS.pipeline(transaction=False)
+        for post_id, delta in deltas.items():
+            pipe.hincrby(PENDING_VIEWS_KEY, post_id, delta)
+        pipe.execute()
+    except RedisError:
+        with local_pending_lock:
+            local_pending_views.update(deltas)
+        raise
+
+
+def add_views(deltas):
+    """Прибавляет просмотры к Post.views одним UPDATE на пачку."""
+    post_ids = list(deltas)
+    for start in range(0, len(post_ids), VIEWS_FLUSH_BATCH_SIZE):
+        batch = post_ids[start:start + VIEWS_FLUSH_BATCH_SIZE]
+        Post.objects.filter(id__in=batch).update(
+            views=F('views') + Case(
+                *[When(id=post_id, then=Value(deltas[post_id]))
+                  for post_id in batch],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+
+def move_legacy_views():
+    """Переносит старые счётчики post:<id>:views в хэш несброшенных.
+
+    Post.views начинается с нуля, поэтому всё, что в нём уже есть,
+    посчитано новым кодом, и старый счётчик прибавляется целиком.
+    Ключ удаляется в той же транзакции MULTI, что и HINCRBY: если
+    перенос оборвётся, счётчик не прибавится второй раз.
+    """
+    moved = 0
+    for key in REDIS.scan_iter('post:*:views'):
+        post_id = int(key.split(b':')[1])
+        with REDIS.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                views = pipe.get(key)
+                if views is None:
+                    continue
+                pipe.multi()
+                pipe.hincrby(PENDING_VIEWS_KEY, post_id, int(views))
+                pipe.delete(key)
+                pipe.execute()
+            except WatchError:
+                # Ключ изменился; он перенесётся при следующем запуске.
+                continue
+        moved += 1
+    return moved
+
+
+def flush_pending_views():
+    """Переносит накопленные просмотры из Redis в БД.
+
+    Хэш сначала атомарно переименовывается, так что новые просмотры
+    копятся в свежем ключе. Если прошлый сброс упал, его данные
+    остаются в FLUSHING_VIEWS_KEY и сбрасываются при следующем запуске.
+    Одновременно сбрасывает один процесс; второй сразу возвращает 0.
+    """
+    with redis_lock(REDIS, FLUSH_LOCK_KEY, VIEWS_FLUSH_LOCK_TTL) as locked:
+        if not locked:
+            return 0
+        return flush_views()
+
+
+def flush_views():
+    """Применяет сброшенный хэш ровно один раз.
+
+    У каждого сброса свой flush_id; он записывается в ViewFlush в той
+    же транзакции, что и просмотры. Если после коммита хэш из Redis
+    не удалился, повторный запуск видит flush_id в БД и только
+    удаляет хэш.
+    """
+    if not REDIS.exists(FLUSHING_VIEWS_KEY):
+        if not REDIS.exists(PENDING_VIEWS_KEY):
+            return 0
+        REDIS.rename(PENDING_VIEWS_KEY, FLUSHING_VIEWS_KEY)
+    REDIS.set(FLUSH_ID_KEY, uuid.uuid4().hex, nx=True)
+    flush_id = REDIS.get(FLUSH_ID_KEY).decode()
+    deltas = {
+        int(post_id): int(delta)
+        for post_id, delta in REDIS.hgetall(FLUSHING_VIEWS_KEY).items()
+    }
+    with transaction.atomic():
+        _, created = ViewFlush.objects.get_or_create(flush_id=flush_id)
+        if created:
+            add_views(deltas)
+        ViewFlush.objects.filter(
+            created_at__lt=timezone.now()
+            - timedelta(seconds=VIEWS_FLUSH_LOG_TTL)
+        ).delete()
+        transaction.on_commit(
+            lambda: REDIS.delete(FLUSHING_VIEWS_KEY, FLUSH_ID_KEY)
+        )
+    return len(deltas) if created else 0
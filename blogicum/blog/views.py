@@ -1,32 +1,55 @@
+import json
+import mimetypes
+import posixpath
+from pathlib import Path
+from urllib.parse import quote
+
 from django.views import View
 from django.views.generic import ListView, CreateView
 from django.views.generic import UpdateView, DeleteView, DetailView
 from django.shortcuts import get_object_or_404, redirect
-from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.urls import reverse_lazy, reverse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
 
-import redis
-
-from .constants import MAX_POSTS
+from .constants import (
+    COMMENT_INLINE_DEPTH, COMMENT_MAX_DEPTH, HOT_VIEW_WEIGHT, LIKES_BATCH_SIZE,
+    MAX_POSTS, UPLOAD_CHUNK_SIZE
+)
+from .follows import follow, get_follow_stats, is_following, unfollow
 from .forms import CommentForm, PostForm, UserProfileForm
-from .mixins import CommentMixin, OnlyAuthorMixin
-from .models import Post, Category, Comment, Contact
-from .utils import get_user, get_user_posts, posts_queryset
-
-
-REDIS = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB
+from .like_store import get_like_state, record_like, record_likes
+from .likes import SHARDED_MODELS, like_kind
+from .mixins import (
+    CommentMixin, ImageUploadMixin, KeysetPaginationMixin, LikedPostsMixin,
+    OnlyAuthorMixin
+)
+from .models import Post, Category, Comment, ImageUpload
+from .ranking import HotPosts, bump_post
+from .redis_client import REDIS
+from .uploads import UploadOffsetError, start_upload, write_chunk
+from .timeline import (
+    backfill_timeline, following_posts_filter, trim_timeline
+)
+from .utils import (
+    get_comment_replies, get_comment_thread,
+    get_post_comments, get_post_detail, get_user, get_user_posts,
+    is_post_available, posts_queryset
+)
+from .view_stats import (
+    buffer_view, heaviest_post_ids, record_view, trending_post_ids, viewer_id
 )
 
 
-class PostListView(ListView):
+class PostListView(LikedPostsMixin, KeysetPaginationMixin, ListView):
     model = Post
     paginate_by = MAX_POSTS
     template_name = 'blog/index.html'
@@ -35,7 +58,7 @@ class PostListView(ListView):
         return posts_queryset(Post.objects)
 
 
-class PostCreateView(LoginRequiredMixin, CreateView):
+class PostCreateView(LoginRequiredMixin, ImageUploadMixin, CreateView):
     model = Post
     form_class = PostForm
     template_name = 'blog/create.html'
@@ -50,7 +73,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return reverse('blog:profile', args=[username])
 
 
-class PostUpdateView(OnlyAuthorMixin, UpdateView):
+class PostUpdateView(OnlyAuthorMixin, ImageUploadMixin, UpdateView):
     model = Post
     form_class = PostForm
     template_name = 'blog/create.html'
@@ -91,25 +114,39 @@ class PostDetailView(DetailView):
     template_name = 'blog/detail.html'
 
     def get_object(self, queryset=None):
-        post_id = self.kwargs.get('post_id')
-        post = get_object_or_404(Post, id=post_id)
-        if (post.author == self.request.user or (post.is_published
-           and post.category.is_published)):
+        post = get_post_detail(self.kwargs.get('post_id'))
+        if is_post_available(post, self.request.user):
             return post
         raise Http404('Страница не найдена')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
-        total_views = REDIS.incr(f'post:{post.id}:views')
-        comments = post.comments.all().order_by('created_at')
+        post = self.object
+        total_views = post.views + buffer_view(post.id)
+        bump_post(post, HOT_VIEW_WEIGHT)
         context['form'] = CommentForm()
+        comments = get_post_comments(post)
+        comment_thread = get_comment_thread(post, comments)
         context['comments'] = comments
+        context['comment_thread'] = comment_thread
+        context['collapse_depth'] = COMMENT_INLINE_DEPTH
+        context['liked_comment_ids'] = get_like_state(
+            self.request.user, comment_thread
+        )
+        reply_to = self.request.GET.get('reply_to', '')
+        if reply_to.isdigit():
+            context['reply_to'] = (
+                post.comments.select_related('author')
+                .filter(id=reply_to).first()
+            )
         context['total_views'] = total_views
+        context['unique_viewers'] = record_view(
+            post.id, viewer_id(self.request)
+        )
         return context
 
 
-class CategoryPostsView(ListView):
+class CategoryPostsView(LikedPostsMixin, KeysetPaginationMixin, ListView):
     model = Post
     paginate_by = MAX_POSTS
     template_name = 'blog/category.html'
@@ -129,6 +166,47 @@ class CategoryPostsView(ListView):
         return context
 
 
+class PopularPostsView(LikedPostsMixin, ListView):
+    paginate_by = MAX_POSTS
+    template_name = 'blog/popular.html'
+
+    def get_category(self):
+        slug = self.kwargs.get('category_slug')
+        if not slug:
+            return None
+        return get_object_or_404(Category, slug=slug, is_published=True)
+
+    def get_queryset(self):
+        self.category = self.get_category()
+        return HotPosts(
+            posts_queryset(Post.objects),
+            self.category.id if self.category else None
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        return context
+
+
+class TrendingPostsView(LikedPostsMixin, ListView):
+    paginate_by = MAX_POSTS
+    template_name = 'blog/trending.html'
+
+    def get_queryset(self):
+        if self.kwargs.get('all_time'):
+            post_ids = heaviest_post_ids()
+        else:
+            post_ids = trending_post_ids()
+        posts = posts_queryset(Post.objects).in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['all_time'] = self.kwargs.get('all_time', False)
+        return context
+
+
 class AddCommentView(LoginRequiredMixin, CreateView):
     model = Comment
     form_class = CommentForm
@@ -137,12 +215,63 @@ class AddCommentView(LoginRequiredMixin, CreateView):
         post_id = self.kwargs.get('post_id')
         return reverse('blog:post_detail', kwargs={'post_id': post_id})
 
+    def get_parent(self, post):
+        parent_id = self.request.POST.get('parent', '')
+        if not parent_id.isdigit():
+            return None
+        parent = get_object_or_404(Comment, id=parent_id, post=post)
+        if parent.depth >= COMMENT_MAX_DEPTH:
+            return parent.parent
+        return parent
+
     def form_valid(self, form):
         post_id = self.kwargs.get('post_id')
         post = get_object_or_404(Post, id=post_id)
         form.instance.post = post
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        form.instance.parent = self.get_parent(post)
+        with transaction.atomic():
+            return super().form_valid(form)
+
+
+def render_comment_thread(request, post, comment_thread, collapse_depth):
+    return render_to_string(
+        'includes/comment_list.html',
+        {
+            'post': post,
+            'comment_thread': comment_thread,
+            'collapse_depth': collapse_depth,
+            'liked_comment_ids': get_like_state(
+                request.user, comment_thread
+            ),
+        },
+        request=request
+    )
+
+
+def post_comments(request, post_id):
+    post = get_post_detail(post_id)
+    if not is_post_available(post, request.user):
+        raise Http404('Страница не найдена')
+    comments = get_post_comments(post, cursor=request.GET.get('cursor'))
+    html = render_comment_thread(
+        request, post, get_comment_thread(post, comments),
+        COMMENT_INLINE_DEPTH
+    )
+    return JsonResponse({'html': html, 'next': comments.next_cursor})
+
+
+def comment_replies(request, post_id, comment_id):
+    post = get_post_detail(post_id)
+    if not is_post_available(post, request.user):
+        raise Http404('Страница не найдена')
+    comment = get_object_or_404(Comment, id=comment_id, post=post)
+    html = render_comment_thread(
+        request, post,
+        get_comment_replies(comment, after=request.GET.get('after')),
+        comment.depth + COMMENT_INLINE_DEPTH
+    )
+    return JsonResponse({'html': html})
 
 
 class EditCommentView(CommentMixin, UpdateView):
@@ -162,12 +291,16 @@ class EditCommentView(CommentMixin, UpdateView):
 class DeleteCommentView(CommentMixin, DeleteView):
     pk_url_kwarg = 'comment_id'
 
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(request, *args, **kwargs)
+
     def get_success_url(self):
         post_id = self.kwargs.get('post_id')
         return reverse_lazy('blog:post_detail', kwargs={'post_id': post_id})
 
 
-class ProfileView(ListView):
+class ProfileView(LikedPostsMixin, KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/profile.html'
     paginate_by = MAX_POSTS
@@ -180,9 +313,26 @@ class ProfileView(ListView):
         context = super().get_context_data(**kwargs)
         if 'profile' not in context:
             context['profile'] = get_user(self.kwargs.get('username'))
+        context['follow_stats'] = get_follow_stats(context['profile'])
+        context['is_following'] = is_following(
+            self.request.user, context['profile']
+        )
         return context
 
 
+class FollowingFeedView(
+    LoginRequiredMixin, LikedPostsMixin, KeysetPaginationMixin, ListView
+):
+    model = Post
+    paginate_by = MAX_POSTS
+    template_name = 'blog/following.html'
+
+    def get_queryset(self):
+        return posts_queryset(Post.objects).filter(
+            following_posts_filter(self.request.user)
+        )
+
+
 class EditProfileView(LoginRequiredMixin, UpdateView):
     model = User
     form_class = UserProfileForm
@@ -198,38 +348,69 @@ class EditProfileView(LoginRequiredMixin, UpdateView):
         return self.request.user
 
 
+def like_response(request, model):
+    obj_id = request.POST.get('id', '')
+    action = request.POST.get('action')
+    if (not request.user.is_authenticated or not obj_id.isdigit()
+            or action not in ('like', 'unlike')):
+        return JsonResponse({'status': 'error'})
+    try:
+        changed, total_likes = record_like(
+            model, int(obj_id), request.user, action == 'like'
+        )
+    except model.DoesNotExist:
+        return JsonResponse({'status': 'error'})
+    return JsonResponse(
+        {'status': 'ok', 'changed': changed, 'total_likes': total_likes}
+    )
+
+
 class PostLike(View):
     def post(self, request, *args, **kwargs):
-        post_id = request.POST.get('id')
-        action = request.POST.get('action')
-        if post_id and action:
-            try:
-                post = Post.objects.get(id=post_id)
-                if action == 'like':
-                    post.users_like.add(request.user)
-                else:
-                    post.users_like.remove(request.user)
-                return JsonResponse({'status': 'ok'})
-            except Post.DoesNotExist:
-                pass
-        return JsonResponse({'status': 'error'})
+        return like_response(request, Post)
 
 
 @require_POST
 def comment_like(request):
-    comment_id = request.POST.get('id')
-    action = request.POST.get('action')
-    if comment_id and action:
-        try:
-            comment = Comment.objects.get(id=comment_id)
-            if action == 'like':
-                comment.users_like.add(request.user)
-            else:
-                comment.users_like.remove(request.user)
-            return JsonResponse({'status': 'ok'})
-        except Post.DoesNotExist:
-            pass
-    return JsonResponse({'status': 'error'})
+    return like_response(request, Comment)
+
+
+@require_POST
+def like_batch(request):
+    """Пачка лайков вида {"operations": [{type, id, action}, ...]}."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error'})
+    try:
+        operations = [
+            (
+                SHARDED_MODELS[operation['type']],
+                int(operation['id']),
+                {'like': True, 'unlike': False}[operation['action']]
+            )
+            for operation in json.loads(request.body)['operations']
+        ]
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'status': 'error'})
+    if not 0 < len(operations) <= LIKES_BATCH_SIZE:
+        return JsonResponse({'status': 'error'})
+    results = []
+    for (model, obj_id, _), result in zip(
+        operations, record_likes(request.user, operations)
+    ):
+        if result is None:
+            results.append({
+                'type': like_kind(model), 'id': obj_id, 'status': 'error'
+            })
+            continue
+        changed, total_likes = result
+        results.append({
+            'type': like_kind(model),
+            'id': obj_id,
+            'status': 'ok',
+            'changed': changed,
+            'total_likes': total_likes,
+        })
+    return JsonResponse({'status': 'ok', 'results': results})
 
 
 @require_POST
@@ -241,21 +422,104 @@ def user_follow(request):
         try:
             user = User.objects.get(id=user_id)
             if action == 'follow':
-                Contact.objects.get_or_create(
-                    user_from=request.user,
-                    user_to=user
-                )
-            else:
-                Contact.objects.filter(
-                    user_from=request.user,
-                    user_to=user
-                ).delete()
-            return JsonResponse({'status': 'ok'})
+                if follow(request.user, user):
+                    backfill_timeline(request.user.id, user.id)
+            elif unfollow(request.user, user):
+                trim_timeline(request.user.id, user.id)
+            return JsonResponse({
+                'status': 'ok',
+                'followers': get_follow_stats(user).followers_count,
+            })
         except User.DoesNotExist:
             return JsonResponse({'status': 'error'})
     return JsonResponse({'status': 'error'})
 
 
+@require_POST
+@login_required
+def image_upload(request):
+    """Начинает загрузку фото частями: {"filename", "size"} -> токен."""
+    try:
+        data = json.loads(request.body)
+        upload = start_upload(
+            request.user, str(data['filename']), int(data['size'])
+        )
+    except (KeyError, TypeError, ValueError, ValidationError):
+        return JsonResponse({'status': 'error'}, status=400)
+    return JsonResponse({
+        'status': 'ok',
+        'token': upload.token,
+        'offset': 0,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+    })
+
+
+@require_http_methods(['GET', 'PUT'])
+@login_required
+def image_upload_chunk(request, token):
+    """Принимает часть фото (PUT) или сообщает, сколько уже получено (GET).
+
+    Смещение части передаётся в заголовке X-Upload-Offset. Если оно
+    не совпадает с полученным, ответ 409 с верным смещением, и клиент
+    продолжает с него.
+    """
+    upload = get_object_or_404(ImageUpload, token=token, user=request.user)
+    if request.method == 'PUT':
+        try:
+            write_chunk(
+                upload,
+                int(request.headers['X-Upload-Offset']),
+                request,
+                int(request.headers['Content-Length'])
+            )
+        except UploadOffsetError as error:
+            return JsonResponse(
+                {'status': 'error', 'offset': error.received}, status=409
+            )
+        except (KeyError, ValueError, ValidationError):
+            return JsonResponse({'status': 'error'}, status=400)
+    return JsonResponse({
+        'status': 'ok',
+        'offset': upload.received,
+        'size': upload.size,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'complete': upload.is_complete,
+    })
+
+
+@staff_member_required
+def redis_metrics(request):
+    return JsonResponse({
+        'circuit_open': REDIS.breaker.is_open,
+        'operations': REDIS.metrics.snapshot(),
+    })
+
+
+def serve_media(request, path):
+    """Отдаёт медиафайл через веб-сервер, а не через Django.
+
+    Django только проверяет путь и ставит заголовок: X-Accel-Redirect
+    на internal-локацию nginx MEDIA_ACCEL_PREFIX или X-Sendfile
+    с путём к файлу для Apache. Имена фото не меняются при правках,
+    поэтому ответ кэшируется надолго.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('..') or not path or path == '.':
+        raise Http404('Файл не найден')
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(path)[0]
+        or 'application/octet-stream'
+    )
+    if settings.MEDIA_ACCEL == 'x-sendfile':
+        response['X-Sendfile'] = str(Path(settings.MEDIA_ROOT) / path)
+    else:
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+        )
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 '''
 class CommentLike(DetailView):
     def comment(self, request, *args, **kwargs):
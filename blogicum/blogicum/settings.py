@@ -1,5 +1,8 @@
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 from .config import SECRET_KEY
 
 
@@ -26,6 +29,13 @@ INTERNAL_IPS = [
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 1
+REDIS_MAX_CONNECTIONS = 50
+REDIS_POOL_TIMEOUT = 0.05
+REDIS_SOCKET_TIMEOUT = 0.25
+REDIS_CONNECT_TIMEOUT = 0.25
+REDIS_BREAKER_THRESHOLD = 3
+REDIS_BREAKER_COOLDOWN = 30
+THUMBNAIL_WORKERS = 2
 # Application definition
 
 INSTALLED_APPS = [
@@ -141,4 +151,33 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
+MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Недогруженные фото; на нескольких узлах — общий для всех каталог.
+UPLOADS_DIR = BASE_DIR / 'uploads'
+
+# 'local' — файлы на диске узла, 's3' — общий бакет S3-совместимого
+# хранилища; для разработки подойдёт MinIO. Ключи доступа значений
+# по умолчанию не имеют и задаются только через окружение.
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'local')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', 'http://localhost:9000')
+S3_BUCKET = os.environ.get('S3_BUCKET', 'blogicum')
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY')
+S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY')
+S3_PUBLIC_URL = os.environ.get(
+    'S3_PUBLIC_URL', f'{S3_ENDPOINT_URL}/{S3_BUCKET}'
+)
+if MEDIA_STORAGE == 's3':
+    if not (S3_ACCESS_KEY and S3_SECRET_KEY):
+        raise ImproperlyConfigured(
+            'MEDIA_STORAGE=s3 требует S3_ACCESS_KEY и S3_SECRET_KEY.'
+        )
+    DEFAULT_FILE_STORAGE = 'blog.storage.S3Storage'
+S3_TIMEOUT = 10
+MEDIA_SIGNED_URLS = os.environ.get('MEDIA_SIGNED_URLS', '1') == '1'
+MEDIA_URL_EXPIRES = 6 * 60 * 60
+# Локальные файлы в продакшене отдаёт веб-сервер: 'x-accel' для nginx,
+# 'x-sendfile' для Apache. Пустое значение — отдаёт сам Django.
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
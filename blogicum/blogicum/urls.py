@@ -1,9 +1,13 @@
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.auth.forms import UserCreationForm
 from django.views.generic.edit import CreateView
-from django.urls import include, path, reverse_lazy
+from django.urls import include, path, re_path, reverse_lazy
+
+from blog.views import serve_media
 
 
 handler404 = 'pages.views.page_not_found'
@@ -31,4 +35,15 @@ if settings.DEBUG:
     import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.MEDIA_ACCEL:
+    urlpatterns += (re_path(
+        r'^{}(?P<path>.+)$'.format(
+            re.escape(settings.MEDIA_URL.lstrip('/'))
+        ),
+        serve_media,
+        name='media'
+    ),)
+else:
+    urlpatterns += static(
+        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+    )
@@ -0,0 +1,125 @@
+(function () {
+  const script = document.currentScript;
+  document.addEventListener('DOMContentLoaded', function () {
+    const csrftoken = Cookies.get('csrftoken');
+    const fileInput = document.querySelector('input[type="file"][name="image"]');
+    const tokenInput = document.getElementById('id_upload_token');
+    if (!fileInput || !tokenInput || !window.fetch || !window.Blob) {
+      return;
+    }
+    const form = fileInput.form;
+    const submit = form.querySelector('[type="submit"]');
+    const status = document.createElement('div');
+    status.className = 'form-text';
+    fileInput.after(status);
+    // Pauses between retries after a network error, in milliseconds.
+    const RETRY_DELAYS = [1000, 2000, 5000, 10000, 30000];
+
+    function storageKey(file) {
+      return 'upload:' + [file.name, file.size, file.lastModified].join(':');
+    }
+
+    function request(url, options) {
+      options.headers = Object.assign(
+        {'X-CSRFToken': csrftoken}, options.headers || {}
+      );
+      options.mode = 'same-origin';
+      return fetch(url, options).then(function (response) {
+        return response.json().then(function (data) {
+          if (!response.ok && response.status !== 409) {
+            throw new Error(data['status']);
+          }
+          return data;
+        });
+      });
+    }
+
+    function begin(file) {
+      // A token saved for the same file lets a reloaded page resume.
+      var saved = localStorage.getItem(storageKey(file));
+      if (saved) {
+        var url = script.dataset.startUrl + saved + '/';
+        return request(url, {method: 'GET'})
+          .then(function (data) {
+            return {url: url, token: saved, offset: data['offset'], chunkSize: data['chunk_size']};
+          })
+          .catch(function () {
+            localStorage.removeItem(storageKey(file));
+            return begin(file);
+          });
+      }
+      return request(script.dataset.startUrl, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size})
+      }).then(function (data) {
+        localStorage.setItem(storageKey(file), data['token']);
+        return {
+          url: script.dataset.startUrl + data['token'] + '/',
+          token: data['token'],
+          offset: data['offset'],
+          chunkSize: data['chunk_size']
+        };
+      });
+    }
+
+    function sendChunks(file, upload, attempt) {
+      if (upload.offset >= file.size) {
+        return Promise.resolve(upload);
+      }
+      status.textContent = 'Загружено ' + Math.floor(upload.offset * 100 / file.size) + '%';
+      var chunk = file.slice(upload.offset, upload.offset + upload.chunkSize);
+      return request(upload.url, {
+        method: 'PUT',
+        headers: {'X-Upload-Offset': upload.offset, 'Content-Type': 'application/octet-stream'},
+        body: chunk
+      }).then(function (data) {
+        // On 409 the server tells where to continue from.
+        upload.offset = data['offset'];
+        return sendChunks(file, upload, 0);
+      }, function (error) {
+        if (attempt >= RETRY_DELAYS.length) {
+          throw error;
+        }
+        status.textContent = 'Нет связи, повторяем…';
+        return new Promise(function (resolve) {
+          setTimeout(resolve, RETRY_DELAYS[attempt]);
+        }).then(function () {
+          return request(upload.url, {method: 'GET'});
+        }).then(function (data) {
+          upload.offset = data['offset'];
+          return sendChunks(file, upload, attempt + 1);
+        }, function () {
+          return sendChunks(file, upload, attempt + 1);
+        });
+      });
+    }
+
+    fileInput.addEventListener('change', function () {
+      var file = fileInput.files[0];
+      tokenInput.value = '';
+      if (!file) {
+        return;
+      }
+      submit.disabled = true;
+      begin(file)
+        .then(function (upload) {
+          return sendChunks(file, upload, 0);
+        })
+        .then(function (upload) {
+          localStorage.removeItem(storageKey(file));
+          tokenInput.value = upload.token;
+          // The file is already on the server: do not send it again.
+          fileInput.removeAttribute('name');
+          status.textContent = 'Фото загружено';
+        })
+        .catch(function (error) {
+          status.textContent = 'Не удалось загрузить фото частями, оно уйдёт вместе с формой';
+          console.error('Upload error:', error);
+        })
+        .finally(function () {
+          submit.disabled = false;
+        });
+    });
+  });
+})();
@@ -32,9 +32,7 @@ var options = {
         
         // update follower count
         var followerCount = document.querySelector('span.btn-outline-secondary .total');
-        var totalFollowers = parseInt(followerCount.innerHTML);
-        followerCount.innerHTML = previousAction === 'follow' ? totalFollowers
-+ 1 : totalFollowers - 1;
+        followerCount.innerHTML = data['followers'];
       }
     }) 
   });
\ No newline at end of file
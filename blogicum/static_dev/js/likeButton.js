@@ -1,45 +1,88 @@
 document.addEventListener('DOMContentLoaded', function() {
     const csrftoken = Cookies.get('csrftoken');
-    const likeButtons = document.querySelectorAll('a.btn-light');
-    const url = likeButtons[0].dataset.url;
-    
+    // Clicks within this window are sent together as one batch.
+    const BATCH_DELAY = 400;
+    // Objects clicked since the last batch, with their state before it.
+    var pending = new Map();
+    var timer = null;
 
-    var options = {
-      method: 'POST',
-      headers: {'X-CSRFToken': csrftoken},
-      mode: 'same-origin'
+    function showState(likeButton, action, delta) {
+      var likeCountElement = document.getElementById(likeButton.dataset.id);
+      likeButton.dataset.action = action;
+      likeButton.text = (action === 'unlike' ? '❤️' : '🤍');
+      likeCountElement.textContent = parseInt(likeCountElement.textContent) + delta;
     }
 
-    likeButtons.forEach(function(likeButton) {
-    likeButton.addEventListener('click', function (e) {
-      e.preventDefault();
-      var likeButton = this;
-      var formData = new FormData();
-      formData.append('id', likeButton.dataset.id);
-      formData.append('action', likeButton.dataset.action);
-      options['body'] = formData;
-      var postId = this.getAttribute('data-id');
-      var likeCountElement = document.getElementById(postId);
-     
-      fetch(url, options, postId)
+    function revert(key, entry) {
+      // A newer click on the same object owns the button now.
+      if (pending.has(key) || entry.button.dataset.action === entry.initial) {
+        return;
+      }
+      showState(entry.button, entry.initial, entry.initial === 'like' ? -1 : 1);
+    }
+
+    function sendBatch() {
+      var entries = [];
+      pending.forEach(function (entry, key) {
+        // Toggled back to where it started: nothing to send.
+        if (entry.button.dataset.action !== entry.initial) {
+          entries.push([key, entry]);
+        }
+      });
+      pending.clear();
+      if (!entries.length) {
+        return;
+      }
+      var operations = entries.map(function ([key, entry]) {
+        return {
+          type: entry.button.dataset.type,
+          id: parseInt(entry.button.dataset.id),
+          action: entry.initial
+        };
+      });
+      var options = {
+        method: 'POST',
+        headers: {'X-CSRFToken': csrftoken, 'Content-Type': 'application/json'},
+        mode: 'same-origin',
+        body: JSON.stringify({operations: operations})
+      }
+
+      fetch(entries[0][1].button.dataset.batchUrl, options)
           .then(response => response.json())
           .then(data => {
-              if (data['status'] === 'ok') {
-                  var previousAction = likeButton.dataset.action;
-                  var action = previousAction === 'like' ? 'unlike' : 'like';
-                  likeButton.dataset.action = action;
-                  likeButton.innerHTML = action;
-                  likeButton.text = (previousAction == 'like' ? '❤️' : '🤍');
-                  
-
-                  var likeCount = likeCountElement.textContent;
-                  var totalLikes = parseInt(likeCount);
-                  likeCountElement.textContent = previousAction === 'like' ? totalLikes + 1 : totalLikes - 1;
+              if (data['status'] !== 'ok') {
+                  entries.forEach(([key, entry]) => revert(key, entry));
+                  return;
               }
+              data['results'].forEach(function (result, index) {
+                  var [key, entry] = entries[index];
+                  if (result['status'] !== 'ok') {
+                      revert(key, entry);
+                  } else if (result['total_likes'] !== null && !pending.has(key)) {
+                      document.getElementById(entry.button.dataset.id).textContent = result['total_likes'];
+                  }
+              });
           })
           .catch(error => {
+              entries.forEach(([key, entry]) => revert(key, entry));
               console.error('Fetch error:', error);
           });
-    })
-  });
-  })
\ No newline at end of file
+    }
+
+    // Delegated so that comments loaded later get working buttons too.
+    document.addEventListener('click', function (e) {
+      var likeButton = e.target.closest('a.btn-light[data-id]');
+      if (!likeButton) {
+        return;
+      }
+      e.preventDefault();
+      var key = likeButton.dataset.type + ':' + likeButton.dataset.id;
+      if (!pending.has(key)) {
+        pending.set(key, {button: likeButton, initial: likeButton.dataset.action});
+      }
+      var liking = likeButton.dataset.action === 'like';
+      showState(likeButton, liking ? 'unlike' : 'like', liking ? 1 : -1);
+      clearTimeout(timer);
+      timer = setTimeout(sendBatch, BATCH_DELAY);
+    });
+  })
@@ -0,0 +1,48 @@
+document.addEventListener('DOMContentLoaded', function() {
+  const loadButton = document.getElementById('load-comments');
+  const commentList = document.getElementById('comments');
+
+  if (loadButton) {
+    loadButton.addEventListener('click', function(e) {
+      e.preventDefault();
+      loadButton.disabled = true;
+      const url = loadButton.dataset.url + '?cursor=' + loadButton.dataset.cursor;
+
+      fetch(url, {mode: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+          commentList.insertAdjacentHTML('beforeend', data['html']);
+          if (data['next']) {
+            loadButton.dataset.cursor = data['next'];
+            loadButton.disabled = false;
+          } else {
+            loadButton.remove();
+          }
+        })
+        .catch(error => {
+          loadButton.disabled = false;
+          console.error('Fetch error:', error);
+        });
+    });
+  }
+
+  commentList.addEventListener('click', function(e) {
+    const repliesButton = e.target.closest('.load-replies');
+    if (!repliesButton) {
+      return;
+    }
+    e.preventDefault();
+    repliesButton.disabled = true;
+
+    fetch(repliesButton.dataset.url, {mode: 'same-origin'})
+      .then(response => response.json())
+      .then(data => {
+        repliesButton.closest('.media').insertAdjacentHTML('afterend', data['html']);
+        repliesButton.remove();
+      })
+      .catch(error => {
+        repliesButton.disabled = false;
+        console.error('Fetch error:', error);
+      });
+  });
+})
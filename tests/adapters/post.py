@@ -33,6 +33,13 @@ class PostModelAdapter(StudentModelAdapter):
             "author",
             "category",
             "location",
+            "total_likes",
+            "comment_count",
+            "sharded_likes",
+            "image",
+            "image_width",
+            "image_height",
+            "image_placeholder",
             "refresh_from_db",
         ]
 
@@ -0,0 +1,59 @@
+import socket
+import sys
+from collections import Counter
+
+import fakeredis
+import pytest
+import redis
+
+from blog import like_store, redis_client, view_stats
+
+
+def resilient_redis(**pool_kwargs) -> redis_client.ResilientRedis:
+    return redis_client.ResilientRedis(
+        connection_pool=redis.BlockingConnectionPool(
+            queue_class=redis_client.ConnectionQueue, **pool_kwargs
+        ),
+        breaker=redis_client.CircuitBreaker(threshold=3, cooldown=30),
+    )
+
+
+def use_redis(monkeypatch, client: redis_client.ResilientRedis):
+    """Подменяет REDIS во всех модулях blog, которые импортировали клиент.
+
+    Накопленные в памяти процесса запасные данные тоже сбрасываются,
+    чтобы они не перетекали из одного теста в другой.
+    """
+    original = redis_client.REDIS
+    for name, module in list(sys.modules.items()):
+        if (
+                name.split(".")[0] == "blog"
+                and getattr(module, "REDIS", None) is original
+        ):
+            monkeypatch.setattr(module, "REDIS", client)
+    monkeypatch.setattr(view_stats, "local_pending_views", Counter())
+    monkeypatch.setattr(like_store, "offline_likes_pending", True)
+    return client
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Клиент ResilientRedis поверх fakeredis.
+
+    Предохранитель и метрики работают как в бою.
+    """
+    return use_redis(monkeypatch, resilient_redis(
+        connection_class=fakeredis.FakeConnection,
+        server=fakeredis.FakeServer(),
+    ))
+
+
+@pytest.fixture
+def down_redis(monkeypatch):
+    """Клиент, направленный на порт, где никто не слушает."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    return use_redis(monkeypatch, resilient_redis(
+        host="127.0.0.1", port=port, socket_connect_timeout=0.25,
+    ))
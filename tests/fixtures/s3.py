@@ -0,0 +1,180 @@
+import os
+import threading
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import pytest
+
+NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+# Адрес MinIO или другого S3-совместимого сервера с бакетом S3_BUCKET.
+S3_TEST_ENDPOINT = os.environ.get("S3_TEST_ENDPOINT")
+# Ключи только для тестового сервера; fake_s3 подпись не проверяет.
+S3_TEST_ACCESS_KEY = os.environ.get("S3_TEST_ACCESS_KEY", "minioadmin")
+S3_TEST_SECRET_KEY = os.environ.get("S3_TEST_SECRET_KEY", "minioadmin")
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """Объекты, составные загрузки и ListObjectsV2 в памяти процесса.
+
+    Подпись запросов не проверяется.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def parse(self):
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, dict(parse_qsl(url.query, keep_blank_values=True))
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def reply(self, status=200, body=b"", headers=None, length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header(
+            "Content-Length", len(body) if length is None else length
+        )
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        # Сервер молча закрывает соединение keep-alive, как делают
+        # балансировщики по таймауту простоя: клиент узнает об этом
+        # только на следующем запросе.
+        self.close_connection = self.server.drop_connections
+
+    def xml(self, root, content):
+        self.reply(body=(
+            f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<{root} xmlns="{NAMESPACE}">{content}</{root}>'
+        ).encode())
+
+    def not_found(self):
+        self.reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+
+    def do_PUT(self):
+        _, key, params = self.parse()
+        body = self.read_body()
+        if "uploadId" in params:
+            parts = self.server.uploads[params["uploadId"]]
+            parts[int(params["partNumber"])] = body
+        else:
+            self.server.objects[key] = body
+        self.reply(headers={"ETag": f'"{uuid.uuid4().hex}"'})
+
+    def do_POST(self):
+        _, key, params = self.parse()
+        self.read_body()
+        if "uploads" in params:
+            upload_id = uuid.uuid4().hex
+            self.server.uploads[upload_id] = {}
+            self.xml(
+                "InitiateMultipartUploadResult",
+                f"<UploadId>{upload_id}</UploadId>"
+            )
+            return
+        parts = self.server.uploads.pop(params["uploadId"])
+        self.server.objects[key] = b"".join(
+            parts[number] for number in sorted(parts)
+        )
+        self.xml("CompleteMultipartUploadResult", f"<Key>{key}</Key>")
+
+    def do_DELETE(self):
+        _, key, params = self.parse()
+        if "uploadId" in params:
+            self.server.uploads.pop(params["uploadId"], None)
+        else:
+            self.server.objects.pop(key, None)
+        self.reply(204)
+
+    def do_HEAD(self):
+        _, key, _ = self.parse()
+        if key not in self.server.objects:
+            self.not_found()
+            return
+        self.reply(headers={
+            "Last-Modified": formatdate(usegmt=True),
+        }, length=len(self.server.objects[key]))
+
+    def do_GET(self):
+        _, key, params = self.parse()
+        if key:
+            if key not in self.server.objects:
+                self.not_found()
+                return
+            self.reply(body=self.server.objects[key])
+            return
+        self.list_objects(params)
+
+    def list_objects(self, params):
+        prefix = params.get("prefix", "")
+        delimiter = params.get("delimiter", "")
+        entries = set()
+        for key in self.server.objects:
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                entries.add(
+                    ("prefix", prefix + rest.split(delimiter)[0] + delimiter)
+                )
+            else:
+                entries.add(("key", key))
+        entries = sorted(entries, key=lambda entry: entry[1])
+        start = int(params.get("continuation-token", 0))
+        page = entries[start:start + self.server.page_size]
+        content = "".join(
+            f"<CommonPrefixes><Prefix>{escape(name)}</Prefix>"
+            "</CommonPrefixes>" if kind == "prefix" else
+            f"<Contents><Key>{escape(name)}</Key></Contents>"
+            for kind, name in page
+        )
+        if start + self.server.page_size < len(entries):
+            content += (
+                "<NextContinuationToken>"
+                f"{start + self.server.page_size}"
+                "</NextContinuationToken>"
+            )
+        self.xml("ListBucketResult", content)
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeS3Handler)
+        self.objects = {}
+        self.uploads = {}
+        self.page_size = 1000
+        self.drop_connections = False
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+
+@pytest.fixture
+def fake_s3():
+    """Локальный S3-совместимый сервер в отдельном потоке."""
+    server = FakeS3Server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def s3_endpoint(request):
+    """S3_TEST_ENDPOINT, если задан, иначе адрес fake_s3."""
+    if S3_TEST_ENDPOINT:
+        return S3_TEST_ENDPOINT
+    return request.getfixturevalue("fake_s3").endpoint
@@ -0,0 +1,62 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from mixer.backend.django import Mixer
+
+from blog.models import Comment, Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def comment_count(post: Model) -> int:
+    post.refresh_from_db(fields=["comment_count"])
+    return post.comment_count
+
+
+def test_comment_count_follows_comments(
+        user_client: Client, post_with_published_location: Model,
+):
+    post = post_with_published_location
+    for text in ("first", "second"):
+        user_client.post(f"/posts/{post.id}/comment/", {"text": text})
+    assert comment_count(post) == 2, (
+        "Убедитесь, что новый комментарий увеличивает Post.comment_count."
+    )
+    comment = Comment.objects.filter(post=post).first()
+    user_client.post(f"/posts/{post.id}/delete_comment/{comment.id}/")
+    assert comment_count(post) == 1, (
+        "Убедитесь, что удаление комментария уменьшает Post.comment_count."
+    )
+
+
+def test_comment_count_after_cascade(
+        mixer: Mixer, user: Model, post_with_published_location: Model,
+):
+    post = post_with_published_location
+    author = mixer.blend("auth.User")
+    mixer.blend("blog.Comment", post=post, author=author)
+    mixer.blend("blog.Comment", post=post, author=user)
+    author.delete()
+    assert comment_count(post) == 1
+
+
+@pytest.mark.parametrize("rebuild", [
+    lambda: call_command("rebuild_comment_counts"),
+    lambda: import_module(
+        "blog.migrations.0008_post_comment_count"
+    ).fill_comment_count(apps, None),
+], ids=["command", "migration"])
+def test_comment_count_backfill(
+        mixer: Mixer, post_with_published_location: Model, rebuild,
+):
+    post = post_with_published_location
+    mixer.cycle(3).blend("blog.Comment", post=post)
+    empty = mixer.blend("blog.Post")
+    Post.objects.update(comment_count=9)
+    rebuild()
+    assert comment_count(post) == 3
+    assert comment_count(empty) == 0
@@ -0,0 +1,129 @@
+import re
+from http import HTTPStatus
+
+import pytest
+from django.db.models import Model
+from django.test.client import Client
+from mixer.backend.django import Mixer
+
+from blog.constants import (
+    COMMENT_INLINE_DEPTH, COMMENT_INLINE_REPLIES, COMMENT_REPLIES_PER_PAGE,
+    COMMENTS_PER_PAGE
+)
+from blog.models import Comment
+
+pytestmark = [pytest.mark.django_db]
+
+
+def reply(post: Model, author: Model, text: str, parent=None) -> Comment:
+    return Comment.objects.create(
+        post=post, author=author, text=text, parent=parent
+    )
+
+
+def comment_ids(html: str) -> list:
+    return [int(pk) for pk in re.findall(r'name="comment_(\d+)"', html)]
+
+
+def more_replies_url(html: str) -> str:
+    urls = re.findall(
+        r'data-url="([^"]+\?after=[^"]+)"\s*>\s*Показать ещё ответы', html
+    )
+    return urls[0] if urls else None
+
+
+def test_thread_paths(
+        user: Model, user_client: Client, post_with_published_location: Model,
+):
+    post = post_with_published_location
+    chain = [reply(post, user, "root")]
+    for depth in range(1, COMMENT_INLINE_DEPTH + 2):
+        chain.append(reply(post, user, f"depth{depth}", chain[-1]))
+    other = reply(post, user, "other")
+    for comment in chain:
+        comment.refresh_from_db()
+    assert [comment.depth for comment in chain] == list(range(len(chain)))
+    assert chain[-1].path.count("/") == COMMENT_INLINE_DEPTH + 1
+    assert chain[0].replies_count == 1
+
+    html = user_client.get(f"/posts/{post.id}/").content.decode()
+    shown = comment_ids(html)
+    assert shown == [comment.id for comment in chain[:-1]] + [other.id]
+    assert "Показать ответы (1)" in html
+    collapsed = chain[COMMENT_INLINE_DEPTH]
+    data = user_client.get(
+        f"/posts/{post.id}/comments/{collapsed.id}/replies/"
+    ).json()
+    assert comment_ids(data["html"]) == [chain[-1].id]
+
+    response = user_client.post(
+        f"/posts/{post.id}/comment/", {"text": "ответ", "parent": other.id}
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    answer = Comment.objects.get(text="ответ")
+    assert answer.parent_id == other.id and answer.depth == 1
+    html = user_client.get(
+        f"/posts/{post.id}/?reply_to={other.id}"
+    ).content.decode()
+    assert f'name="parent" value="{other.id}"' in html
+
+    chain[1].delete()
+    chain[0].refresh_from_db()
+    assert chain[0].replies_count == 0
+
+
+def test_inline_replies_capped(
+        user: Model, user_client: Client, post_with_published_location: Model,
+):
+    post = post_with_published_location
+    root = reply(post, user, "root")
+    replies = [
+        reply(post, user, f"reply{number}", root)
+        for number in range(COMMENT_INLINE_REPLIES + COMMENT_REPLIES_PER_PAGE)
+    ]
+    quiet = reply(post, user, "quiet")
+    reply(post, user, "single", quiet)
+
+    html = user_client.get(f"/posts/{post.id}/").content.decode()
+    inline = replies[:COMMENT_INLINE_REPLIES]
+    assert comment_ids(html)[:COMMENT_INLINE_REPLIES + 1] == (
+        [root.id] + [comment.id for comment in inline]
+    ), (
+        "Убедитесь, что у корневого комментария сразу показываются только "
+        "первые COMMENT_INLINE_REPLIES ответов."
+    )
+    assert len(comment_ids(html)) == COMMENT_INLINE_REPLIES + 3
+    assert html.count("Показать ещё ответы") == 1
+
+    loaded = []
+    url = more_replies_url(html)
+    while url:
+        html = user_client.get(url).json()["html"]
+        page = comment_ids(html)
+        assert len(page) <= COMMENT_REPLIES_PER_PAGE
+        loaded += page
+        url = more_replies_url(html)
+    assert loaded == [comment.id for comment in replies[len(inline):]]
+
+
+def test_root_comments_paginated(
+        mixer: Mixer, user_client: Client,
+        post_with_published_location: Model,
+):
+    post = post_with_published_location
+    roots = mixer.cycle(COMMENTS_PER_PAGE * 2 + 5).blend(
+        "blog.Comment", post=post
+    )
+    response = user_client.get(f"/posts/{post.id}/")
+    page = response.context["comments"]
+    shown = [comment.id for comment in page]
+    assert len(shown) == COMMENTS_PER_PAGE
+    assert 'id="load-comments"' in response.content.decode()
+    cursor = page.next_cursor
+    while cursor:
+        data = user_client.get(
+            f"/posts/{post.id}/comments/?cursor={cursor}"
+        ).json()
+        shown += comment_ids(data["html"])
+        cursor = data["next"]
+    assert shown == [comment.id for comment in roots]
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog.constants import MAX_OFFSET_PAGES, MAX_POSTS
+from blog.models import Post
+from blog.utils import get_user_posts, posts_queryset
+
+pytestmark = [pytest.mark.django_db]
+
+N_POSTS = 35
+
+
+@pytest.fixture
+def feed_posts(mixer: Mixer, user: Model, published_category: Model):
+    now = timezone.now()
+    # Повторяющиеся даты проверяют, что курсор различает публикации по id.
+    return mixer.cycle(N_POSTS).blend(
+        "blog.Post",
+        author=user,
+        category=published_category,
+        is_published=True,
+        pub_date=(now - timedelta(hours=i % 7 + 1) for i in range(N_POSTS)),
+    )
+
+
+def page_ids(response) -> list:
+    return [post.id for post in response.context["page_obj"]]
+
+
+def test_cursor_pages(client: Client, feed_posts: list):
+    response = client.get("/")
+    seen = page_ids(response)
+    page = response.context["page_obj"]
+    assert not page.has_previous()
+    while page.has_next():
+        response = client.get(f"/?cursor={page.next_cursor}")
+        assert response.status_code == HTTPStatus.OK
+        page = response.context["page_obj"]
+        seen += page_ids(response)
+    assert len(seen) == len(set(seen)) == N_POSTS, (
+        "Убедитесь, что курсорная пагинация не теряет и не повторяет "
+        "публикации с одинаковой датой."
+    )
+    expected = sorted(
+        feed_posts, key=lambda post: (post.pub_date, post.id), reverse=True
+    )
+    assert seen == [post.id for post in expected]
+
+    response = client.get(f"/?cursor={page.previous_cursor}")
+    assert page_ids(response) == seen[20:30]
+    assert response.context["page_obj"].has_previous()
+
+
+def test_offset_pages(
+        client: Client, user: Model, published_category: Model,
+        feed_posts: list,
+):
+    first = page_ids(client.get("/"))
+    second = page_ids(client.get("/?page=2"))
+    assert len(first) == len(second) == MAX_POSTS
+    assert not set(first) & set(second)
+    for url in (
+        f"/profile/{user.username}/?page=2",
+        f"/category/{published_category.slug}/?page=2",
+    ):
+        assert client.get(url).status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize("query", [
+    f"page={MAX_OFFSET_PAGES + 1}", "page=0", "page=abc", "cursor=zzz",
+])
+def test_invalid_page(client: Client, feed_posts: list, query: str):
+    assert client.get(f"/?{query}").status_code == HTTPStatus.NOT_FOUND, (
+        "Убедитесь, что номера страниц после MAX_OFFSET_PAGES и "
+        "испорченные курсоры возвращают 404."
+    )
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="План запроса в формате SQLite"
+)
+@pytest.mark.parametrize("queryset, index", [
+    (lambda: posts_queryset(Post.objects), "blog_post_visible_feed_idx"),
+    (
+        lambda: posts_queryset(Post.objects.filter(category_id=1)),
+        "blog_post_category_feed_idx",
+    ),
+    (
+        lambda: get_user_posts(Post.objects.filter(author_id=1)),
+        "blog_post_author_",
+    ),
+], ids=["index", "category", "profile"])
+def test_feed_query_uses_index(queryset, index: str):
+    plan = queryset().order_by("-pub_date", "-id")[:MAX_POSTS + 1].explain()
+    assert f"USING INDEX {index}" in plan, (
+        f"Убедитесь, что первая страница ленты читается по индексу {index}."
+    )
+    assert "TEMP B-TREE" not in plan, plan
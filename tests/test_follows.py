@@ -0,0 +1,73 @@
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+
+from blog.models import Contact, FollowStats
+
+pytestmark = [pytest.mark.django_db]
+
+PROFILE_PAGE_QUERIES = 7
+
+
+def follow(client: Client, user: Model, action: str) -> dict:
+    return client.post(
+        "/profile/follow/", {"id": user.id, "action": action}
+    ).json()
+
+
+def test_follow_twice(user: Model, another_user: Model, user_client: Client):
+    assert follow(user_client, another_user, "follow") == {
+        "status": "ok", "followers": 1
+    }
+    assert follow(user_client, another_user, "follow") == {
+        "status": "ok", "followers": 1
+    }
+    assert Contact.objects.filter(
+        user_from=user, user_to=another_user
+    ).count() == 1, "Убедитесь, что повторная подписка не создаёт дубликатов."
+    assert FollowStats.objects.get(user=user).following_count == 1
+    assert follow(user_client, another_user, "unfollow") == {
+        "status": "ok", "followers": 0
+    }
+    assert not Contact.objects.filter(user_from=user).exists()
+    assert FollowStats.objects.get(user=user).following_count == 0
+
+
+def test_profile_query_count(
+        user: Model, another_user: Model, user_client: Client,
+        django_assert_num_queries,
+):
+    Contact.objects.create(user_from=user, user_to=another_user)
+    call_command("rebuild_follow_counts")
+    with django_assert_num_queries(PROFILE_PAGE_QUERIES):
+        response = user_client.get(f"/profile/{another_user.username}/")
+    assert response.context["follow_stats"].followers_count == 1
+    assert response.context["is_following"] is True
+
+
+def test_follow_counts_without_stats(
+        user: Model, another_user: Model, user_client: Client,
+        django_user_model,
+):
+    third_user = django_user_model.objects.create(username="third")
+    Contact.objects.create(user_from=third_user, user_to=another_user)
+    assert follow(user_client, another_user, "follow") == {
+        "status": "ok", "followers": 2
+    }, (
+        "Убедитесь, что счётчики заводятся до подписки и учитывают "
+        "её ровно один раз."
+    )
+
+
+def test_deleted_user_lowers_follow_counts(
+        user: Model, another_user: Model, user_client: Client,
+):
+    follow(user_client, another_user, "follow")
+    user.delete()
+    assert FollowStats.objects.get(
+        user=another_user
+    ).followers_count == 0, (
+        "Убедитесь, что удаление пользователя уменьшает счётчики "
+        "подписок других пользователей."
+    )
@@ -0,0 +1,86 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from PIL import Image
+
+from blog.images import generate_post_thumbnails, thumbnail_name
+
+pytestmark = [pytest.mark.django_db]
+
+
+def upload(width: int, height: int) -> SimpleUploadedFile:
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "JPEG")
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue())
+
+
+def test_post_thumbnails(
+        post_with_published_location: Model, user_client: Client,
+        settings, tmp_path,
+):
+    settings.MEDIA_ROOT = tmp_path
+    post = post_with_published_location
+    post.image = upload(1000, 500)
+    post.save()
+    post.refresh_from_db()
+    assert post.image_width is None, (
+        "Убедитесь, что до генерации миниатюр размеры фото не заданы."
+    )
+    assert generate_post_thumbnails(post.id)
+    post.refresh_from_db()
+    assert (post.image_width, post.image_height) == (1000, 500)
+    assert post.image_placeholder.startswith("data:image/webp;base64,"), (
+        "Убедитесь, что для фото сохраняется заглушка."
+    )
+    for width in (320, 640, 1000):
+        path = tmp_path / thumbnail_name(post.image.name, width)
+        with Image.open(path) as thumbnail:
+            assert thumbnail.format == "WEBP"
+            assert thumbnail.size == (width, width // 2)
+    content = user_client.get("/").content.decode("utf-8")
+    assert "1000w" in content and 'loading="lazy"' in content
+    assert post.image_placeholder in content
+    content = user_client.get(f"/posts/{post.id}/").content.decode("utf-8")
+    assert post.image_placeholder in content
+    assert (
+        "background-origin: content-box; background-clip: content-box"
+        in content
+    ), (
+        "Убедитесь, что заглушка фото не выходит за фото "
+        "в отступ и рамку img-thumbnail."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_thumbnail_failure_recorded(
+        post_with_published_location: Model, settings, tmp_path,
+):
+    settings.MEDIA_ROOT = tmp_path
+    post = post_with_published_location
+    name = default_storage.save("posts_images/broken.jpg", upload(400, 200))
+    original = (tmp_path / name).read_bytes()
+    (tmp_path / name).write_bytes(b"not an image")
+    type(post).objects.filter(pk=post.pk).update(
+        image=name, image_width=None, image_placeholder=""
+    )
+
+    call_command("generate_thumbnails", "--workers", "1")
+    post.refresh_from_db()
+    assert post.image_width is None
+    assert post.image_error.startswith("UnidentifiedImageError"), (
+        "Убедитесь, что ошибка обработки фото записывается в публикацию."
+    )
+    (tmp_path / name).write_bytes(original)
+    call_command("generate_thumbnails", "--workers", "1")
+    post.refresh_from_db()
+    assert post.image_width is None, (
+        "Убедитесь, что упавшие фото повторяются только по --retry-failed."
+    )
+    call_command("generate_thumbnails", "--workers", "1", "--retry-failed")
+    post.refresh_from_db()
+    assert post.image_width == 400 and post.image_error == ""
@@ -0,0 +1,287 @@
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from mixer.backend.django import Mixer
+from redis.exceptions import ConnectionError
+
+from blog import like_store
+from blog.like_store import (
+    FLUSH_LOCK_KEY, FLUSHING_LIKES_KEY, PENDING_LIKES_KEY,
+    flush_pending_likes, get_like_state, likers_key
+)
+from blog.likes import set_like
+from blog.models import LikeShard, OfflineLike
+from fixtures.redis import use_redis
+
+pytestmark = [pytest.mark.django_db]
+
+
+def like(client: Client, url: str, obj_id: int, action: str) -> dict:
+    return client.post(url, {"id": obj_id, "action": action}).json()
+
+
+@pytest.fixture(params=["fake_redis", "down_redis"])
+def flush(request):
+    """Сброс лайков в БД для обоих режимов хранилища лайков.
+
+    С Redis лайки попадают в таблицы только при flush_likes,
+    без него — сразу, и сбрасывать нечего.
+    """
+    request.getfixturevalue(request.param)
+    if request.param == "down_redis":
+        return lambda: None
+    return lambda: call_command("flush_likes")
+
+
+@pytest.fixture
+def post_comment(mixer: Mixer, post_with_published_location: Model) -> Model:
+    return mixer.blend("blog.Comment", post=post_with_published_location)
+
+
+@pytest.mark.parametrize(
+    "url, fixture", [
+        ("/posts/like/", "post_with_published_location"),
+        ("/posts/like_comment/", "post_comment"),
+    ]
+)
+@pytest.mark.django_db(transaction=True)
+def test_like_counter(
+        user_client: Client, request, url: str, fixture: str, flush,
+):
+    obj = request.getfixturevalue(fixture)
+    response = like(user_client, url, obj.id, "like")
+    assert response["status"] == "ok" and response["changed"] is True
+    assert like(user_client, url, obj.id, "like")["changed"] is False
+    flush()
+    obj.refresh_from_db()
+    assert obj.total_likes == 1, (
+        "Убедитесь, что повторный лайк не меняет счётчик лайков."
+    )
+    assert like(user_client, url, obj.id, "unlike")["changed"] is True
+    assert like(user_client, url, obj.id, "unlike")["changed"] is False
+    flush()
+    obj.refresh_from_db()
+    assert obj.total_likes == 0
+
+
+def test_like_missing_object(user_client: Client, fake_redis):
+    response = like(user_client, "/posts/like/", 10 ** 6, "like")
+    assert response == {"status": "error"}
+    assert not fake_redis.exists(likers_key("post", 10 ** 6))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_likes_in_redis(
+        mixer: Mixer, user: Model, user_client: Client,
+        post_with_published_location: Model, fake_redis,
+):
+    post = post_with_published_location
+    post.users_like.add(mixer.blend("auth.User"))
+    response = like(user_client, "/posts/like/", post.id, "like")
+    assert response == {"status": "ok", "changed": True, "total_likes": 2}, (
+        "Убедитесь, что при пустом Redis лайки, уже сохранённые в БД, "
+        "загружаются в множество лайкнувших."
+    )
+    post.refresh_from_db()
+    assert post.total_likes == 1
+    liked = get_like_state(user, [post])
+    assert liked == {post.id} and post.total_likes == 2
+    html = user_client.get("/").content.decode()
+    assert f'<span id="{post.id}" >2</span>' in html
+
+    call_command("flush_likes")
+    post.refresh_from_db()
+    assert post.total_likes == 2 and post.users_like.filter(pk=user.pk)
+    like(user_client, "/posts/like/", post.id, "unlike")
+    call_command("flush_likes")
+    post.refresh_from_db()
+    assert post.total_likes == 1
+    assert not fake_redis.exists(PENDING_LIKES_KEY, FLUSHING_LIKES_KEY)
+
+
+def test_like_counter_floor(user: Model, post_comment: Model):
+    post = post_comment.post
+    post.users_like.add(user)
+    type(post).objects.filter(pk=post.pk).update(total_likes=0)
+    assert set_like(type(post), post.id, user, False)
+    post.refresh_from_db()
+    assert post.total_likes == 0, (
+        "Убедитесь, что разошедшийся счётчик лайков не уходит ниже нуля."
+    )
+
+
+def test_rebuild_like_counts(user: Model, post_comment: Model):
+    post = post_comment.post
+    post.users_like.add(user)
+    post_comment.users_like.add(user)
+    type(post).objects.update(total_likes=5)
+    type(post_comment).objects.update(total_likes=5)
+    call_command("rebuild_like_counts")
+    post.refresh_from_db()
+    post_comment.refresh_from_db()
+    assert post.total_likes == 1
+    assert post_comment.total_likes == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sharded_likes(
+        mixer: Mixer, user_client: Client, post_with_published_location: Model,
+        flush,
+):
+    post = post_with_published_location
+    call_command("shard_likes", "post", str(post.id))
+    fans = mixer.cycle(3).blend("auth.User")
+    for fan in fans:
+        client = Client()
+        client.force_login(fan)
+        assert like(client, "/posts/like/", post.id, "like")["changed"]
+    flush()
+    post.refresh_from_db()
+    assert post.total_likes == 0, (
+        "Убедитесь, что лайки шардированной публикации пишутся в шарды."
+    )
+    call_command("fold_like_shards")
+    post.refresh_from_db()
+    assert post.total_likes == 3
+    like(user_client, "/posts/like/", post.id, "like")
+    flush()
+    call_command("shard_likes", "post", str(post.id), "--off")
+    post.refresh_from_db()
+    assert post.total_likes == 4 and not post.sharded_likes
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flushed_likes_go_to_shards(
+        mixer: Mixer, post_with_published_location: Model, fake_redis,
+):
+    post = post_with_published_location
+    call_command("shard_likes", "post", str(post.id))
+    clients = []
+    for fan in mixer.cycle(3).blend("auth.User"):
+        client = Client()
+        client.force_login(fan)
+        clients.append(client)
+        assert like(client, "/posts/like/", post.id, "like")["changed"]
+    call_command("flush_likes")
+    post.refresh_from_db()
+    assert post.total_likes == 0 and post.users_like.count() == 3, (
+        "Убедитесь, что сброс лайков из Redis для шардированной "
+        "публикации пишет разницу в шарды, а не в строку публикации."
+    )
+    assert shard_sum(post) == 3
+    like(clients[0], "/posts/like/", post.id, "unlike")
+    call_command("flush_likes")
+    call_command("fold_like_shards")
+    post.refresh_from_db()
+    assert post.total_likes == 2 and shard_sum(post) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_like_flush_applied_once(
+        user_client: Client, post_with_published_location: Model,
+        fake_redis, monkeypatch,
+):
+    post = post_with_published_location
+    like(user_client, "/posts/like/", post.id, "like")
+
+    def fail(*keys):
+        raise ConnectionError("Redis недоступен")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(fake_redis, "delete", fail)
+        with pytest.raises(ConnectionError):
+            flush_pending_likes()
+    assert fake_redis.exists(FLUSHING_LIKES_KEY)
+    assert flush_pending_likes() == 0
+    post.refresh_from_db()
+    assert post.total_likes == 1, (
+        "Убедитесь, что сброс лайков, уже записанный в БД, "
+        "не применяется повторно."
+    )
+    assert not fake_redis.exists(FLUSHING_LIKES_KEY)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_like_flush_skipped_while_locked(
+        user_client: Client, post_with_published_location: Model, fake_redis,
+):
+    post = post_with_published_location
+    like(user_client, "/posts/like/", post.id, "like")
+    fake_redis.set(FLUSH_LOCK_KEY, "other")
+    assert flush_pending_likes() == 0
+    fake_redis.delete(FLUSH_LOCK_KEY)
+    assert flush_pending_likes() == 1
+    post.refresh_from_db()
+    assert post.total_likes == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("flusher_saw_outage", [True, False])
+def test_unlike_during_outage(
+        user: Model, user_client: Client, post_with_published_location: Model,
+        fake_redis, request, monkeypatch, flusher_saw_outage: bool,
+):
+    post = post_with_published_location
+    assert like(user_client, "/posts/like/", post.id, "like")["changed"]
+    request.getfixturevalue("down_redis")
+    assert like(user_client, "/posts/like/", post.id, "unlike")[
+        "status"] == "ok"
+    use_redis(monkeypatch, fake_redis)
+    if not flusher_saw_outage:
+        # Сбрасывает другой процесс, который сбоя не видел.
+        monkeypatch.setattr(like_store, "offline_likes_pending", False)
+    call_command("flush_likes")
+    post.refresh_from_db()
+    assert post.total_likes == 0 and not post.users_like.exists(), (
+        "Убедитесь, что лайк, снятый без Redis, не возвращается "
+        "при сбросе более старого лайка из Redis."
+    )
+    assert get_like_state(user, [post]) == set()
+    assert post.total_likes == 0
+    assert not OfflineLike.objects.exists()
+
+
+def shard_sum(post: Model) -> int:
+    return sum(
+        LikeShard.objects
+        .filter(kind="post", object_id=post.id)
+        .values_list("count", flat=True)
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_like_batch(
+        user_client: Client, post_with_published_location: Model,
+        post_comment: Model, flush,
+):
+    post = post_with_published_location
+    operations = [
+        {"type": "post", "id": post.id, "action": "like"},
+        {"type": "comment", "id": post_comment.id, "action": "like"},
+        {"type": "comment", "id": post_comment.id, "action": "unlike"},
+        {"type": "post", "id": 10 ** 6, "action": "like"},
+    ]
+    response = user_client.post(
+        "/posts/like/batch/", {"operations": operations},
+        content_type="application/json",
+    ).json()
+    assert response["status"] == "ok"
+    assert [result["status"] for result in response["results"]] == [
+        "ok", "ok", "ok", "error"
+    ]
+    flush()
+    post.refresh_from_db()
+    post_comment.refresh_from_db()
+    assert post.total_likes == 1
+    assert post_comment.total_likes == 0
+
+
+@pytest.mark.parametrize("body", [
+    {}, {"operations": []}, {"operations": [{"type": "user", "id": 1}]},
+])
+def test_like_batch_invalid(user_client: Client, body: dict):
+    response = user_client.post(
+        "/posts/like/batch/", body, content_type="application/json"
+    )
+    assert response.json() == {"status": "error"}
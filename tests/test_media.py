@@ -0,0 +1,105 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Model
+from mixer.backend.django import Mixer
+from PIL import Image
+
+from blog.images import generate_post_thumbnails, thumbnail_name
+from blog.media import (
+    add_reference, collect_garbage, rebuild_media_references
+)
+from blog.models import MediaFile
+
+pytestmark = [pytest.mark.django_db]
+
+
+def upload(color: str) -> SimpleUploadedFile:
+    buffer = BytesIO()
+    Image.new("RGB", (400, 300), color).save(buffer, "JPEG")
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue())
+
+
+def references(name: str) -> int:
+    return MediaFile.objects.get(name=name).references
+
+
+def test_same_image_stored_once(
+        mixer: Mixer, post_with_published_location: Model, settings, tmp_path,
+):
+    settings.MEDIA_ROOT = tmp_path
+    first = post_with_published_location
+    first.image = upload("red")
+    first.save()
+    second = mixer.blend("blog.Post", image=upload("red"))
+    assert first.image.name == second.image.name, (
+        "Убедитесь, что одинаковые фото хранятся одним файлом."
+    )
+    name = first.image.name
+    assert len(list(tmp_path.rglob("*.jpg"))) == 1
+    assert references(name) == 2
+
+    generate_post_thumbnails(first.id)
+    first.image = upload("blue")
+    first.save()
+    assert references(name) == 1
+    second.delete()
+    assert references(name) == 0
+
+    assert collect_garbage(grace=0) == 3, (
+        "Убедитесь, что сборщик удаляет фото без ссылок и его миниатюры."
+    )
+    assert not (tmp_path / name).exists()
+    assert not (tmp_path / thumbnail_name(name, 320)).exists()
+    assert (tmp_path / first.image.name).exists()
+    assert not MediaFile.objects.filter(name=name).exists()
+
+
+def test_rebuild_media_references(
+        post_with_published_location: Model, settings, tmp_path,
+):
+    settings.MEDIA_ROOT = tmp_path
+    post = post_with_published_location
+    post.image = upload("green")
+    post.save()
+    MediaFile.objects.all().delete()
+    rebuild_media_references()
+    assert references(post.image.name) == 1
+
+
+def test_garbage_referenced_during_collection(
+        mixer: Mixer, settings, tmp_path, monkeypatch,
+):
+    settings.MEDIA_ROOT = tmp_path
+    post = mixer.blend("blog.Post", image=upload("white"))
+    name = post.image.name
+    post.delete()
+    assert references(name) == 0
+    orphan = default_storage.save("posts_images/orphan.jpg", upload("black"))
+    modified_time = default_storage.get_modified_time
+    depth = len(connection.savepoint_ids)
+
+    def referenced_meanwhile(path):
+        assert len(connection.savepoint_ids) == depth, (
+            "Убедитесь, что сборщик запрашивает время изменения файлов "
+            "до транзакции с блокировкой строк."
+        )
+        if path == name:
+            add_reference(name)
+        return modified_time(path)
+
+    monkeypatch.setattr(
+        default_storage, "get_modified_time", referenced_meanwhile
+    )
+    assert collect_garbage(grace=0) == 1
+    assert (tmp_path / name).exists(), (
+        "Убедитесь, что сборщик не удаляет файл, на который появилась "
+        "ссылка, пока шла сборка."
+    )
+    assert references(name) == 1
+    assert not (tmp_path / orphan).exists(), (
+        "Убедитесь, что файл без строки MediaFile удаляется."
+    )
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+import pytest
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog.constants import COMMENT_INLINE_DEPTH, COMMENTS_PER_PAGE
+
+pytestmark = [pytest.mark.django_db]
+
+DETAIL_PAGE_QUERIES = 6
+INDEX_PAGE_QUERIES = 6
+
+
+@pytest.mark.parametrize("n_comments", [1, 10, 50])
+def test_post_detail_query_count(
+        mixer: Mixer, user: Model, user_client: Client,
+        post_with_published_location: Model, django_assert_num_queries,
+        n_comments: int,
+):
+    post = post_with_published_location
+    comments = mixer.cycle(n_comments).blend("blog.Comment", post=post)
+    for comment in comments[::2]:
+        comment.users_like.add(user)
+    with django_assert_num_queries(DETAIL_PAGE_QUERIES):
+        response = user_client.get(f"/posts/{post.id}/")
+    assert response.status_code == 200
+    liked_on_page = comments[:COMMENTS_PER_PAGE:2]
+    assert response.content.decode().count("❤️") == len(liked_on_page), (
+        "Убедитесь, что на странице поста отмечены комментарии, "
+        "которые понравились пользователю."
+    )
+
+
+@pytest.mark.parametrize("n_replies", [1, 10])
+def test_post_detail_query_count_with_replies(
+        mixer: Mixer, user: Model, user_client: Client,
+        post_with_published_location: Model, django_assert_num_queries,
+        n_replies: int,
+):
+    post = post_with_published_location
+    roots = mixer.cycle(2).blend("blog.Comment", post=post)
+    for root in roots:
+        parent = root
+        for _ in range(n_replies):
+            parent = mixer.blend(
+                "blog.Comment", post=post, parent=parent, author=user
+            )
+            parent.users_like.add(user)
+    with django_assert_num_queries(DETAIL_PAGE_QUERIES):
+        response = user_client.get(f"/posts/{post.id}/")
+    assert response.status_code == 200
+    shown_replies = min(n_replies, COMMENT_INLINE_DEPTH)
+    assert response.content.decode().count("❤️") == 2 * shown_replies, (
+        "Убедитесь, что на странице поста отмечены ответы, "
+        "которые понравились пользователю."
+    )
+
+
+@pytest.mark.parametrize("n_posts", [1, 10])
+def test_index_query_count(
+        mixer: Mixer, user: Model, user_client: Client,
+        published_category: Model, published_location: Model,
+        django_assert_num_queries, n_posts: int,
+):
+    posts = mixer.cycle(n_posts).blend(
+        "blog.Post", category=published_category,
+        location=published_location, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    for post in posts[::2]:
+        post.users_like.add(user)
+    with django_assert_num_queries(INDEX_PAGE_QUERIES):
+        response = user_client.get("/")
+    assert response.status_code == 200
+    assert response.content.decode().count("❤️") == len(posts[::2]), (
+        "Убедитесь, что в ленте отмечены публикации, "
+        "которые понравились пользователю."
+    )
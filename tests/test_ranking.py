@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog.constants import HOT_HALF_LIFE, HOT_REBASE_EXPONENT
+from blog.ranking import HOT_EPOCH_KEY, bump_hot_score, hot_key
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def hot_posts(mixer: Mixer, published_category: Model) -> list:
+    return mixer.cycle(3).blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+def popular_ids(client: Client, url: str = "/popular/") -> list:
+    return [post.id for post in client.get(url).context["page_obj"]]
+
+
+def test_popular_feed(
+        mixer: Mixer, user_client: Client, hot_posts: list, fake_redis,
+):
+    first, second, third = hot_posts
+    user_client.post("/posts/like/", {"id": third.id, "action": "like"})
+    call_command("flush_likes")
+    for text in ("a", "b"):
+        user_client.post(f"/posts/{second.id}/comment/", {"text": text})
+    other = mixer.blend(
+        "blog.Post", category__is_published=True, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    bump_hot_score(other.id, other.category_id, 10)
+    assert popular_ids(user_client) == [other.id, second.id, third.id]
+    category_url = f"/popular/{first.category.slug}/"
+    assert popular_ids(user_client, category_url) == [second.id, third.id]
+
+    call_command("rebuild_hot_posts")
+    assert popular_ids(user_client)[:2] == [second.id, third.id]
+
+
+def test_scores_rebased_instead_of_overflowing(hot_posts: list, fake_redis):
+    first, second, third = hot_posts
+    category_id = first.category_id
+    half_lives = HOT_REBASE_EXPONENT + 1
+    epoch = time.time() - half_lives * HOT_HALF_LIFE
+    fake_redis.set(HOT_EPOCH_KEY, epoch)
+    for post, score in ((first, 2.0), (second, 1.0)):
+        for key in (hot_key(), hot_key(category_id)):
+            fake_redis.zadd(key, {post.id: score})
+
+    bump_hot_score(third.id, category_id, 1)
+
+    new_epoch = float(fake_redis.get(HOT_EPOCH_KEY))
+    assert new_epoch == pytest.approx(time.time(), abs=60), (
+        "Убедитесь, что эпоха рейтинга сдвигается, когда вес событий "
+        "вырастает больше 2 ** HOT_REBASE_EXPONENT."
+    )
+    for key in (hot_key(), hot_key(category_id)):
+        scores = dict(fake_redis.zrange(key, 0, -1, withscores=True))
+        assert scores[str(first.id).encode()] == pytest.approx(
+            2 * 2 ** -half_lives, rel=1e-3
+        )
+        assert scores[str(third.id).encode()] == pytest.approx(1, rel=1e-3)
+
+
+def test_bump_after_long_pause(hot_posts: list, fake_redis):
+    post = hot_posts[0]
+    fake_redis.set(HOT_EPOCH_KEY, time.time() - 5000 * HOT_HALF_LIFE)
+    bump_hot_score(post.id, post.category_id, 1)
+    assert fake_redis.zscore(hot_key(), post.id) == pytest.approx(1, rel=1e-3)
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import fakeredis
+import pytest
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog import view_stats
+from blog.redis_client import (
+    CircuitBreaker, CircuitOpenError, PoolExhaustedError
+)
+from blog.view_stats import PENDING_VIEWS_KEY
+from fixtures.redis import resilient_redis
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_breaker_single_probe(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("blog.redis_client.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 11
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 22
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.before_call()
+
+
+def test_pool_exhaustion_keeps_circuit_closed():
+    client = resilient_redis(
+        connection_class=fakeredis.FakeConnection,
+        server=fakeredis.FakeServer(), max_connections=1, timeout=0.01,
+    )
+    held = client.connection_pool.get_connection("PING")
+    for _ in range(5):
+        with pytest.raises(PoolExhaustedError):
+            client.ping()
+    assert not client.breaker.is_open, (
+        "Убедитесь, что занятый пул соединений не размыкает предохранитель."
+    )
+    client.connection_pool.release(held)
+    assert client.ping()
+
+
+@pytest.fixture
+def viewed_post(mixer: Mixer, published_category: Model) -> Model:
+    return mixer.blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+def test_views_survive_redis_outage(
+        user_client: Client, admin_client: Client, viewed_post: Model,
+        down_redis, monkeypatch,
+):
+    url = f"/posts/{viewed_post.id}/"
+    for views in range(1, 6):
+        assert user_client.get(url).context["total_views"] == views, (
+            "Убедитесь, что без Redis просмотры копятся в памяти процесса."
+        )
+    assert down_redis.breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        down_redis.ping()
+    metrics = admin_client.get("/metrics/redis/").json()
+    assert metrics["circuit_open"]
+    assert metrics["operations"]["HINCRBY"]["errors"] > 0
+
+    recovered = resilient_redis(
+        connection_class=fakeredis.FakeConnection,
+        server=fakeredis.FakeServer(),
+    )
+    monkeypatch.setattr(view_stats, "REDIS", recovered)
+    assert user_client.get(url).context["total_views"] == 6
+    assert int(recovered.hget(PENDING_VIEWS_KEY, viewed_post.id)) == 6, (
+        "Убедитесь, что просмотры из памяти переносятся в Redis, "
+        "когда он снова доступен."
+    )
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog.models import Post
+from blog.timeline import timeline_key
+
+pytestmark = [pytest.mark.django_db(transaction=True)]
+
+
+def follow(client: Client, user: Model, action: str = "follow") -> None:
+    response = client.post(
+        "/profile/follow/", {"id": user.id, "action": action}
+    )
+    assert response.json()["status"] == "ok"
+
+
+def timeline(fake_redis, user: Model) -> set:
+    return {
+        int(post_id)
+        for post_id in fake_redis.zrange(timeline_key(user.id), 0, -1)
+    }
+
+
+def feed_ids(client: Client) -> list:
+    response = client.get("/feed/following/")
+    return [post.id for post in response.context["page_obj"]]
+
+
+@pytest.fixture
+def blend_post(mixer: Mixer, another_user: Model, published_category: Model):
+    def blend(days_ago: int = 1, is_published: bool = True) -> Model:
+        return mixer.blend(
+            "blog.Post", author=another_user, category=published_category,
+            is_published=is_published,
+            pub_date=timezone.now() - timedelta(days=days_ago),
+        )
+    return blend
+
+
+def test_fan_out_on_follow_and_publish(
+        user: Model, another_user: Model, user_client: Client, fake_redis,
+        blend_post,
+):
+    old = blend_post(days_ago=2)
+    follow(user_client, another_user)
+    assert timeline(fake_redis, user) == {old.id}
+    new = blend_post()
+    assert timeline(fake_redis, user) == {old.id, new.id}
+    assert feed_ids(user_client) == [new.id, old.id]
+    follow(user_client, another_user, "unfollow")
+    assert not timeline(fake_redis, user)
+    assert feed_ids(user_client) == []
+
+
+def test_fan_out_only_when_post_becomes_visible(
+        user: Model, another_user: Model, user_client: Client, fake_redis,
+        blend_post,
+):
+    follow(user_client, another_user)
+    hidden = blend_post(is_published=False)
+    assert not timeline(fake_redis, user)
+    hidden.is_published = True
+    hidden.save()
+    assert timeline(fake_redis, user) == {hidden.id}
+
+    fake_redis.zrem(timeline_key(user.id), hidden.id)
+    post = Post.objects.get(pk=hidden.pk)
+    post.title = "Правка"
+    post.save()
+    post.users_like.add(user)
+    assert not timeline(fake_redis, user), (
+        "Убедитесь, что правка видимой публикации не рассылает её "
+        "в ленты повторно."
+    )
+
+
+def test_fan_out_scheduled_post(
+        user: Model, another_user: Model, user_client: Client, fake_redis,
+        blend_post,
+):
+    follow(user_client, another_user)
+    scheduled = blend_post(days_ago=-1)
+    assert not timeline(fake_redis, user)
+    Post.objects.filter(pk=scheduled.pk).update(
+        pub_date=timezone.now() - timedelta(seconds=1)
+    )
+    call_command("publish_scheduled_posts")
+    assert timeline(fake_redis, user) == {scheduled.id}
+
+
+def test_timeline_rebuilt_after_redis_loss(
+        user: Model, another_user: Model, user_client: Client, fake_redis,
+        blend_post,
+):
+    follow(user_client, another_user)
+    posts = [blend_post(days_ago=days) for days in (3, 2, 1)]
+    fake_redis.flushall()
+    assert feed_ids(user_client) == [post.id for post in posts[::-1]], (
+        "Убедитесь, что лента подписок собирается из БД, если её ключа "
+        "в Redis нет."
+    )
+    assert timeline(fake_redis, user) == {post.id for post in posts}
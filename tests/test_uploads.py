@@ -0,0 +1,195 @@
+from io import BytesIO
+
+import pytest
+from django.core.management import call_command
+from django.core.files import File
+from django.db.models import Model
+from django.test.client import Client
+from PIL import Image
+
+from blog.models import ImageUpload, MediaFile, Post
+from blog.uploads import attach_upload, upload_path
+
+pytestmark = [pytest.mark.django_db]
+
+START_URL = "/posts/uploads/"
+
+
+def jpeg_bytes() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (400, 300), "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def put_chunk(client: Client, token: str, offset: int, data: bytes):
+    return client.put(
+        f"{START_URL}{token}/", data,
+        content_type="application/octet-stream",
+        HTTP_X_UPLOAD_OFFSET=str(offset),
+    )
+
+
+def test_chunked_upload(
+        user_client: Client, published_category: Model,
+        django_capture_on_commit_callbacks, settings, tmp_path,
+):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.UPLOADS_DIR = tmp_path / "uploads"
+    data = jpeg_bytes()
+    token = user_client.post(
+        START_URL, {"filename": "photo.jpg", "size": len(data)},
+        content_type="application/json",
+    ).json()["token"]
+
+    middle = len(data) // 2
+    assert put_chunk(user_client, token, 0, data[:middle]).json()[
+        "offset"] == middle
+    response = put_chunk(user_client, token, 0, data[:middle])
+    assert response.status_code == 409, (
+        "Убедитесь, что часть с неверным смещением отклоняется."
+    )
+    assert response.json()["offset"] == middle
+    assert user_client.get(f"{START_URL}{token}/").json()["offset"] == middle
+    assert put_chunk(user_client, token, middle, data[middle:]).json()[
+        "complete"]
+    assert upload_path(token).read_bytes() == data
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        user_client.post("/posts/create/", {
+            "title": "Заголовок",
+            "text": "Текст",
+            "pub_date": "2020-01-01T00:00",
+            "category": published_category.id,
+            "upload_token": token,
+        })
+    post = Post.objects.get(title="Заголовок")
+    assert not post.image and len(callbacks) == 1, (
+        "Убедитесь, что фото привязывается к публикации после коммита."
+    )
+    assert attach_upload(post.id, token)
+    post.refresh_from_db()
+    assert post.image.name.startswith("posts_images/")
+    assert post.image_width == 400
+    assert MediaFile.objects.get(name=post.image.name).references == 1
+    assert not ImageUpload.objects.exists()
+    assert not upload_path(token).exists()
+
+
+def test_upload_rejects_other_users(
+        user_client: Client, another_user_client: Client, settings, tmp_path,
+):
+    settings.UPLOADS_DIR = tmp_path
+    token = user_client.post(
+        START_URL, {"filename": "photo.jpg", "size": 10},
+        content_type="application/json",
+    ).json()["token"]
+    assert put_chunk(another_user_client, token, 0, b"x").status_code == 404
+    assert user_client.post(
+        START_URL, {"filename": "notes.txt", "size": 10},
+        content_type="application/json",
+    ).status_code == 400
+
+
+def png_bytes(broken: bool = False) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), "blue").save(buffer, "PNG")
+    data = bytearray(buffer.getvalue())
+    if broken:
+        # Портится байт в данных IDAT: заголовок читается, CRC — нет.
+        data[data.index(b"IDAT") + 8] ^= 0xFF
+    return bytes(data)
+
+
+def upload_file(client: Client, data: bytes, filename: str) -> str:
+    token = client.post(
+        START_URL, {"filename": filename, "size": len(data)},
+        content_type="application/json",
+    ).json()["token"]
+    assert put_chunk(client, token, 0, data).json()["complete"]
+    return token
+
+
+def create_post(client: Client, category: Model, token: str):
+    return client.post("/posts/create/", {
+        "title": "Заголовок",
+        "text": "Текст",
+        "pub_date": "2020-01-01T00:00",
+        "category": category.id,
+        "upload_token": token,
+    })
+
+
+@pytest.fixture
+def upload_dirs(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.UPLOADS_DIR = tmp_path / "uploads"
+
+
+def test_upload_header_checked(
+        user_client: Client, published_category: Model, upload_dirs,
+):
+    token = upload_file(user_client, b"not an image at all", "photo.jpg")
+    response = create_post(user_client, published_category, token)
+    assert response.status_code == 200
+    assert not Post.objects.filter(title="Заголовок").exists(), (
+        "Убедитесь, что форма с загруженным файлом не-фото не принимается."
+    )
+
+
+def test_broken_image_recorded(
+        user_client: Client, published_category: Model, upload_dirs,
+        django_capture_on_commit_callbacks,
+):
+    token = upload_file(user_client, png_bytes(broken=True), "photo.png")
+    with django_capture_on_commit_callbacks():
+        create_post(user_client, published_category, token)
+    post = Post.objects.get(title="Заголовок")
+    assert not attach_upload(post.id, token)
+    post.refresh_from_db()
+    assert not post.image and post.image_error, (
+        "Убедитесь, что ошибка проверки фото записывается в публикацию."
+    )
+    assert not ImageUpload.objects.exists()
+
+
+def test_attach_keeps_newer_image(
+        user_client: Client, published_category: Model, upload_dirs,
+        django_capture_on_commit_callbacks, monkeypatch,
+):
+    token = upload_file(user_client, png_bytes(), "photo.png")
+    with django_capture_on_commit_callbacks():
+        create_post(user_client, published_category, token)
+    post = Post.objects.get(title="Заголовок")
+    opened = File
+
+    def replaced_meanwhile(file):
+        Post.objects.filter(pk=post.pk).update(image="posts_images/new.png")
+        return opened(file)
+
+    monkeypatch.setattr("blog.uploads.File", replaced_meanwhile)
+    assert not attach_upload(post.id, token)
+    post.refresh_from_db()
+    assert post.image.name == "posts_images/new.png", (
+        "Убедитесь, что фоновая привязка не затирает фото, "
+        "сменённое за время её работы."
+    )
+    assert not MediaFile.objects.filter(references__gt=0).exists()
+
+
+def test_attach_retried_by_clean_uploads(
+        user_client: Client, published_category: Model, upload_dirs,
+        django_capture_on_commit_callbacks,
+):
+    token = upload_file(user_client, png_bytes(), "photo.png")
+    with django_capture_on_commit_callbacks() as callbacks:
+        create_post(user_client, published_category, token)
+    assert len(callbacks) == 1
+    post = Post.objects.get(title="Заголовок")
+    assert ImageUpload.objects.get(token=token).post == post
+    call_command("clean_uploads", "--attach-delay", "0")
+    post.refresh_from_db()
+    assert post.image and post.image_width == 40, (
+        "Убедитесь, что clean_uploads привязывает фото, "
+        "задание для которого потерялось."
+    )
+    assert not ImageUpload.objects.exists()
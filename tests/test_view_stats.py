@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.test.client import Client
+from django.utils import timezone
+from mixer.backend.django import Mixer
+from redis.exceptions import ConnectionError
+
+from blog.models import Post
+from blog.view_stats import (
+    FLUSH_LOCK_KEY, FLUSHING_VIEWS_KEY, PENDING_VIEWS_KEY,
+    flush_pending_views
+)
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def viewed_posts(mixer: Mixer, published_category: Model) -> list:
+    return mixer.cycle(3).blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+def view(client: Client, post: Model):
+    return client.get(f"/posts/{post.id}/").context
+
+
+def trending_ids(client: Client, url: str = "/trending/") -> list:
+    return [post.id for post in client.get(url).context["page_obj"]]
+
+
+def test_unique_viewers(
+        user_client: Client, another_user_client: Client,
+        viewed_posts: list, fake_redis,
+):
+    post = viewed_posts[0]
+    for _ in range(3):
+        assert view(user_client, post)["unique_viewers"] == 1
+    assert view(another_user_client, post)["unique_viewers"] == 2
+    assert view(Client(), post)["unique_viewers"] == 3
+
+
+def test_refreshes_do_not_make_trending(
+        user_client: Client, another_user_client: Client,
+        viewed_posts: list, fake_redis,
+):
+    refreshed, shared, unseen = viewed_posts
+    for _ in range(10):
+        view(user_client, refreshed)
+    for client in (user_client, another_user_client, Client()):
+        view(client, shared)
+    for url in ("/trending/", "/trending/all/"):
+        assert trending_ids(user_client, url) == [shared.id, refreshed.id], (
+            "Убедитесь, что в тренды публикацию выводят новые зрители, "
+            "а не повторные просмотры одного зрителя."
+        )
+
+
+def stored_views(post: Model) -> int:
+    return Post.objects.get(pk=post.pk).views
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_views(
+        user_client: Client, viewed_posts: list, fake_redis,
+):
+    first, second, _ = viewed_posts
+    for _ in range(3):
+        context = view(user_client, first)
+    assert context["total_views"] == 3
+    view(user_client, second)
+    call_command("flush_post_views")
+    assert stored_views(first) == 3 and stored_views(second) == 1
+    assert view(user_client, first)["total_views"] == 4
+    assert not fake_redis.exists(FLUSHING_VIEWS_KEY)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_applied_once_when_cleanup_fails(
+        user_client: Client, viewed_posts: list, fake_redis, monkeypatch,
+):
+    post = viewed_posts[0]
+    view(user_client, post)
+    view(user_client, post)
+    def fail(*keys):
+        raise ConnectionError("Redis недоступен")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(fake_redis, "delete", fail)
+        with pytest.raises(ConnectionError):
+            flush_pending_views()
+    assert fake_redis.exists(FLUSHING_VIEWS_KEY)
+    assert flush_pending_views() == 0
+    assert stored_views(post) == 2, (
+        "Убедитесь, что сброс просмотров, уже записанный в БД, "
+        "не применяется повторно."
+    )
+    assert not fake_redis.exists(FLUSHING_VIEWS_KEY)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_skipped_while_locked(viewed_posts: list, fake_redis):
+    post = viewed_posts[0]
+    fake_redis.hset(PENDING_VIEWS_KEY, post.id, 5)
+    fake_redis.set(FLUSH_LOCK_KEY, "other")
+    assert flush_pending_views() == 0
+    assert stored_views(post) == 0
+    fake_redis.delete(FLUSH_LOCK_KEY)
+    assert flush_pending_views() == 1
+    assert stored_views(post) == 5
+    assert not fake_redis.exists(FLUSH_LOCK_KEY)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconcile_legacy_views(
+        user_client: Client, viewed_posts: list, fake_redis,
+):
+    post, other, _ = viewed_posts
+    for _ in range(3):
+        view(user_client, post)
+    flush_pending_views()
+    fake_redis.set(f"post:{post.id}:views", 100)
+    fake_redis.set(f"post:{other.id}:views", 7)
+    call_command("reconcile_post_views")
+    assert stored_views(post) == 103, (
+        "Убедитесь, что старый счётчик просмотров прибавляется целиком: "
+        "Post.views считался с нуля."
+    )
+    assert stored_views(other) == 7
+    assert not fake_redis.exists(f"post:{post.id}:views")
+    call_command("reconcile_post_views")
+    assert stored_views(post) == 103
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Model
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from blog.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def visible_ids() -> set:
+    return set(
+        Post.objects.filter(is_visible=True).values_list("id", flat=True)
+    )
+
+
+@pytest.fixture
+def current_post(mixer: Mixer, published_category: Model) -> Model:
+    return mixer.blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+@pytest.fixture
+def scheduled_post(mixer: Mixer, published_category: Model) -> Model:
+    return mixer.blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() + timedelta(days=1),
+    )
+
+
+def test_post_visibility_on_save(current_post: Model, scheduled_post: Model):
+    assert visible_ids() == {current_post.id}, (
+        "Убедитесь, что is_visible установлен только у опубликованных "
+        "публикаций с наступившей датой."
+    )
+    current_post.is_published = False
+    current_post.save()
+    assert not visible_ids()
+    scheduled_post.pub_date = timezone.now() - timedelta(minutes=1)
+    scheduled_post.save()
+    assert visible_ids() == {scheduled_post.id}
+
+
+def test_post_visibility_follows_category(
+        published_category: Model, current_post: Model,
+        scheduled_post: Model,
+):
+    published_category.is_published = False
+    published_category.save()
+    assert not visible_ids(), (
+        "Убедитесь, что снятие категории с публикации скрывает её "
+        "публикации."
+    )
+    published_category.is_published = True
+    published_category.save()
+    assert visible_ids() == {current_post.id}
+    published_category.delete()
+    assert not visible_ids()
+
+
+def test_publish_scheduled_posts(current_post: Model, scheduled_post: Model):
+    call_command("publish_scheduled_posts")
+    assert visible_ids() == {current_post.id}
+    Post.objects.filter(pk=scheduled_post.pk).update(
+        pub_date=timezone.now() - timedelta(seconds=1)
+    )
+    call_command("publish_scheduled_posts")
+    assert visible_ids() == {current_post.id, scheduled_post.id}, (
+        "Убедитесь, что publish_scheduled_posts открывает публикации, "
+        "у которых наступила дата."
+    )